@@ -0,0 +1,214 @@
+"""
+Throughput benchmarks for the register/activate pipeline.
+
+Run with ``python runtests.py --benchmark``. Each benchmark runs against a
+freshly created test database with Django's locmem mail backend and
+reports wall time, operations per second and database queries per
+operation. Results are returned (and printed by ``runtests.py``) as JSON
+so runs can be compared between commits.
+"""
+import datetime
+import multiprocessing
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from registration import forms
+from registration import get_site
+from registration import hashing
+from registration import keys
+from registration.models import RegistrationProfile
+
+
+def measure(func, count):
+    """
+    Calls ``func(i)`` for ``i`` in ``range(count)`` and returns timing and
+    query statistics.
+    """
+    queries = 0
+    elapsed = 0.0
+    for i in range(count):
+        with CaptureQueriesContext(connection) as context:
+            start = time.time()
+            func(i)
+            elapsed += time.time() - start
+        queries += len(context)
+    return {
+        'count': count,
+        'seconds': round(elapsed, 4),
+        'per_second': round(count / elapsed, 2) if elapsed else None,
+        'queries_per_call': round(queries / float(count), 2),
+    }
+
+
+def bench_register_view(users):
+    client = Client()
+    url = reverse("registration_register")
+
+    def register(i):
+        client.post(url, {
+            'username': 'view%d' % i,
+            'email': 'view%d@example.com' % i,
+            'password1': 'secret',
+            'password2': 'secret',
+        })
+        del mail.outbox[:]
+
+    return measure(register, users)
+
+
+def bench_activate_view(users):
+    client = Client()
+    keys = list(RegistrationProfile.objects.filter(
+        user__username__startswith='view').exclude(
+            activation_key=RegistrationProfile.ACTIVATED).values_list(
+                'activation_key', flat=True)[:users])
+
+    def activate(i):
+        client.get(reverse(
+            "registration_activate", kwargs={'activation_key': keys[i]}))
+
+    return measure(activate, len(keys))
+
+
+def bench_create_inactive_user(users):
+    def create(i):
+        RegistrationProfile.objects.create_inactive_user(
+            'manager%d' % i, 'secret', 'manager%d@example.com' % i)
+
+    return measure(create, users)
+
+
+def bench_activate_user(users):
+    keys = list(RegistrationProfile.objects.filter(
+        user__username__startswith='manager').exclude(
+            activation_key=RegistrationProfile.ACTIVATED).values_list(
+                'activation_key', flat=True)[:users])
+
+    def activate(i):
+        RegistrationProfile.objects.activate_user(keys[i])
+
+    return measure(activate, len(keys))
+
+
+def seed_expired_users(count, prefix):
+    """
+    Creates ``count`` expired, never activated registrations directly with
+    bulk inserts (unusable passwords, so no hashing cost).
+    """
+    user_model = get_user_model()
+    joined = timezone.now() - datetime.timedelta(days=365)
+    user_model.objects.bulk_create([
+        user_model(username='%s%d' % (prefix, i), is_active=False,
+                   date_joined=joined, password='!')
+        for i in range(count)], batch_size=500)
+    RegistrationProfile.objects.bulk_create([
+        RegistrationProfile(user=user, activation_key='expired',
+                            expires_at=joined)
+        for user in user_model.objects.filter(
+            username__startswith=prefix)], batch_size=500)
+
+
+def bench_delete_expired_users(sizes):
+    results = []
+    for size in sizes:
+        seed_expired_users(size, 'expired%d-' % size)
+        result = measure(
+            lambda i: RegistrationProfile.objects.delete_expired_users(), 1)
+        result['table_size'] = size
+        results.append(result)
+    return results
+
+
+def bench_key_generation(count=10000):
+    """
+    Microbenchmark of the activation key generators, without the database.
+    """
+    user = get_user_model()(username='someone')
+    generators = {
+        'sha1': keys.sha1_key_generator,
+        'urandom': keys.default_key_generator,
+        'pool': keys.KeyPool(size=1000),
+    }
+    return dict(
+        (name, measure(lambda i: generator(user), count))
+        for name, generator in generators.items())
+
+
+def bench_render_email(count=2000):
+    """
+    Render cost per activation email: three ``render_to_string`` calls,
+    each running the context processors for its own request context (the
+    path used before ``registration.rendering``), against one
+    ``render_templates`` call sharing the context.
+    """
+    user = RegistrationProfile.objects.create_inactive_user(
+        'render', 'secret', 'render@example.com')
+    request = RequestFactory().get('/')
+    email = forms.ActivationEmail(user, request)
+    site = get_site(request)
+
+    def render_separately(i):
+        render_to_string(email.activation_subject_template_name,
+                         {'site': site}, request=request)
+        for template_name in (email.activation_template_name,
+                              email.activation_html_template_name):
+            render_to_string(template_name, email.get_email_context(site),
+                             request=request)
+
+    return {
+        'render_to_string': measure(render_separately, count),
+        'render_templates': measure(
+            lambda i: email._render_activation_email(site), count),
+    }
+
+
+def bench_password_hashing(users, batch_size=50):
+    """
+    Bulk registrations per second, hashing in the calling process and in
+    a pool of one worker per CPU.
+    """
+    processes = multiprocessing.cpu_count()
+    results = {'cpu_count': processes, 'bulk_batch_size': batch_size}
+    for name, setting in (('in_process', None), ('pool', processes)):
+        prefix = 'hash-%s-' % name
+        with override_settings(
+                REGISTRATION_PASSWORD_HASHING_PROCESSES=setting):
+            hashing.get_pool()  # start the workers outside the timings
+            results[name] = measure(
+                lambda i: RegistrationProfile.objects.
+                bulk_create_inactive_users([
+                    {'username': '%s%d-%d' % (prefix, i, j),
+                     'password': 'secret',
+                     'email': '%s%d-%d@example.com' % (prefix, i, j)}
+                    for j in range(batch_size)]),
+                max(1, users // batch_size))
+        hashing.close_pool()
+    return results
+
+
+def run(users=200, cleanup_sizes=(1000, 5000, 20000)):
+    return {
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'users': users,
+        'results': {
+            'register_view': bench_register_view(users),
+            'activate_view': bench_activate_view(users),
+            'create_inactive_user': bench_create_inactive_user(users),
+            'activate_user': bench_activate_user(users),
+            'delete_expired_users': bench_delete_expired_users(
+                cleanup_sizes),
+            'key_generation': bench_key_generation(),
+            'render_email': bench_render_email(),
+            'password_hashing': bench_password_hashing(users),
+        },
+    }
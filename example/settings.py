@@ -34,7 +34,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': 'example.db',
-    }
+    },
+    # stands in for a read replica (see REGISTRATION_READ_DATABASE); a
+    # separate database in tests, so they can tell which one was read
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'example-replica.db',
+    },
 }
 
 
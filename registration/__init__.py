@@ -1,10 +1,27 @@
 VERSION = (0, 5, 1)
 
+default_app_config = 'registration.apps.RegistrationConfig'
+
 
 def get_version():
     return ".".join(str(v) for v in VERSION)
 
 
 def get_site(request):
+    """
+    Returns the site for ``request``. With ``django.contrib.sites``
+    installed, the Site matching the request's host is used (see
+    ``registration.sites``), falling back to a ``RequestSite``. Without a
+    request (e.g. from a management command) the current Site is used.
+    """
+    from django.apps import apps
+    if apps.is_installed('django.contrib.sites'):
+        from django.contrib.sites.models import Site
+        from registration.sites import get_site_for_host
+        if request is None:
+            return Site.objects.get_current()
+        site = get_site_for_host(request.get_host())
+        if site is not None:
+            return site
     from django.contrib.sites.requests import RequestSite
     return RequestSite(request)
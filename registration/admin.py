@@ -1,25 +1,58 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.utils.timezone import now as utc_now
 
+from registration import forms
 from registration import models
-from registration import get_site
+
+
+class ExpiredListFilter(admin.SimpleListFilter):
+    title = 'activation key expired'
+    parameter_name = 'expired'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Yes'), ('no', 'No'))
+
+    def queryset(self, request, queryset):
+        # on the indexed columns, not the is_expired annotation
+        if self.value() == 'yes':
+            return queryset.filter(
+                Q(activation_key=models.RegistrationProfile.ACTIVATED) |
+                Q(expires_at__lte=utc_now()))
+        if self.value() == 'no':
+            return queryset.unexpired()
+        return queryset
 
 
 class RegistrationAdmin(admin.ModelAdmin):
     actions = ('activate_users', 'resend_activation_email')
-    list_display = ('user', 'activation_key_expired')
+    date_hierarchy = 'expires_at'
+    list_display = ('user', 'activation_key_expired', 'expires_at')
+    list_filter = (ExpiredListFilter, )
+    list_select_related = ('user', )
     raw_id_fields = ('user', )
-    search_fields = ('user__username', 'user__first_name')
+    search_fields = ('=user__username', '=user__email')
+
+    def get_queryset(self, request):
+        return super(RegistrationAdmin, self).get_queryset(
+            request).annotate_expired()
+
+    def activation_key_expired(self, profile):
+        return profile.is_expired
+    activation_key_expired.boolean = True
+    activation_key_expired.admin_order_field = 'is_expired'
 
     def activate_users(self, request, queryset):
-        for profile in queryset:
-            models.RegistrationProfile.objects.activate_user(
-                profile.activation_key)
+        activated = models.RegistrationProfile.objects.activate_profiles(
+            queryset)
+        self.message_user(request, "Activated %d user(s)." % len(activated))
 
     def resend_activation_email(self, request, queryset):
-        site = get_site(request)
-        for profile in queryset:
-            if not profile.activation_key_expired():
-                profile.send_activation_email(site)
+        sent, skipped = forms.resend_activation_emails(queryset, request)
+        self.message_user(
+            request,
+            "Sent %d activation email(s), skipped %d expired or "
+            "activated profile(s)." % (sent, skipped))
 
 
 admin.site.register(models.RegistrationProfile, RegistrationAdmin)
@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.apps import apps
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+
+class RegistrationConfig(AppConfig):
+    name = 'registration'
+
+    def ready(self):
+        if apps.is_installed('django.contrib.sites'):
+            from django.contrib.sites.models import Site
+            from registration.sites import clear_site_cache
+            post_save.connect(clear_site_cache, sender=Site,
+                              dispatch_uid='registration_clear_site_cache')
+            post_delete.connect(clear_site_cache, sender=Site,
+                                dispatch_uid='registration_clear_site_cache')
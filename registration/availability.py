@@ -0,0 +1,181 @@
+"""
+Fast username availability answers for the registration form's live check.
+
+Lookups go through three layers before the database:
+
+* the Django cache, holding recent answers for
+  ``REGISTRATION_AVAILABILITY_CACHE_TIMEOUT`` seconds and every username
+  registered since the Bloom filters were built;
+* a Bloom filter of taken usernames, built by the ``buildusernamefilter``
+  management command and shared through the cache. A miss means the
+  name is free, so most names typed never reach the database. Run the
+  command more often than ``REGISTRATION_AVAILABILITY_FILTER_TIMEOUT``
+  seconds; without a current filter every lookup goes to the database.
+  The filter takes about 2.4 bytes per user, which has to fit in one
+  cache entry (1MB by default with memcached);
+* the database, for names the filter thinks might be taken.
+
+These answers are hints for the user; ``RegistrationForm.clean_username``
+still checks the database when the form is submitted.
+"""
+import hashlib
+import math
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from registration import routers
+
+
+class BloomFilter(object):
+    """
+    A fixed size Bloom filter sized for ``capacity`` items at roughly
+    ``error_rate`` false positives.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(
+            self.size / float(capacity) * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.sha1(item.encode('utf-8')).digest()
+        first, second = struct.unpack('<QQ', digest[:16])
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, item):
+        with self._lock:
+            for position in self._positions(item):
+                self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item):
+        return all(self.bits[position // 8] & (1 << (position % 8))
+                   for position in self._positions(item))
+
+
+FILTER_CACHE_KEY = "registration:username_filter"
+FILTER_VERSION_CACHE_KEY = "registration:username_filter:version"
+
+_filter = None
+_filter_built = 0
+_filter_checked = 0
+_filter_lock = threading.Lock()
+
+
+def _get_setting(name, default):
+    return getattr(settings, 'REGISTRATION_AVAILABILITY_' + name, default)
+
+
+def build_username_filter():
+    """
+    Builds the Bloom filter of taken (lowercased) usernames from the user
+    table and stores it in the cache for every process to load.
+
+    Scanning the table and hashing every name takes a while on large
+    sites, so this runs from the ``buildusernamefilter`` management
+    command, never on a request. Returns the number of usernames added.
+    """
+    user_model = get_user_model()
+    usernames = user_model.objects.using(
+        routers.read_database()).values_list(
+        user_model.USERNAME_FIELD, flat=True)
+    count = usernames.count()
+    bloom = BloomFilter(
+        max(1000, count * 2), _get_setting('FILTER_ERROR_RATE', 0.01))
+    for username in usernames.iterator():
+        bloom.add(username.lower())
+    timeout = _get_setting('FILTER_TIMEOUT', 3600)
+    cache.set(FILTER_CACHE_KEY, bloom, timeout)
+    cache.set(FILTER_VERSION_CACHE_KEY, time.time(), timeout)
+    return count
+
+
+def get_username_filter():
+    """
+    Returns the Bloom filter last stored by ``build_username_filter``, or
+    None when there is none or it's older than
+    ``REGISTRATION_AVAILABILITY_FILTER_TIMEOUT`` seconds.
+
+    The process keeps its own copy and looks for a newer one in the cache
+    at most every ``REGISTRATION_AVAILABILITY_FILTER_CHECK_INTERVAL``
+    seconds, only fetching the filter itself when it has changed.
+    """
+    global _filter, _filter_built, _filter_checked
+    now = time.time()
+    with _filter_lock:
+        interval = _get_setting('FILTER_CHECK_INTERVAL', 60)
+        if now - _filter_checked >= interval:
+            _filter_checked = now
+            built = cache.get(FILTER_VERSION_CACHE_KEY)
+            if built is None:
+                _filter = None
+            elif built != _filter_built or _filter is None:
+                _filter = cache.get(FILTER_CACHE_KEY)
+                _filter_built = built
+        if now - _filter_built > _get_setting('FILTER_TIMEOUT', 3600):
+            return None
+        return _filter
+
+
+def reset_username_filter():
+    global _filter, _filter_built, _filter_checked
+    with _filter_lock:
+        _filter, _filter_built, _filter_checked = None, 0, 0
+
+
+def _cache_key(username):
+    return "registration:username:%s" % hashlib.sha1(
+        username.lower().encode('utf-8')).hexdigest()
+
+
+def username_available(username):
+    """
+    Returns True when no user has ``username``, ignoring case.
+    """
+    key = _cache_key(username)
+    available = cache.get(key)
+    if available is not None:
+        return available
+
+    bloom = get_username_filter()
+    if bloom is not None and username.lower() not in bloom:
+        available = True
+    else:
+        user_model = get_user_model()
+        username_lookup = "{}__iexact".format(user_model.USERNAME_FIELD)
+        available = not user_model.objects.using(
+            routers.read_database()).filter(
+                **{username_lookup: username}).exists()
+    cache.set(key, available, _get_setting('CACHE_TIMEOUT', 30))
+    return available
+
+
+def mark_taken(*usernames):
+    """
+    Records newly registered usernames. The cache entries outlive the
+    current Bloom filters of every process, so the other processes see
+    the names as taken until their filters are rebuilt.
+    """
+    if _filter is not None:
+        for username in usernames:
+            _filter.add(username.lower())
+    cache.set_many(
+        dict((_cache_key(username), False) for username in usernames),
+        _get_setting('FILTER_TIMEOUT', 3600))
@@ -0,0 +1,145 @@
+"""
+Delivery backends decide when and how activation emails leave the process.
+
+The backend is chosen with the ``REGISTRATION_DELIVERY_BACKEND`` setting,
+a dotted path to one of the classes below (or your own subclass of
+``BaseDelivery``). The default sends the message right away, inside the
+request, just like ``user.email_user`` used to.
+"""
+import logging
+import threading
+
+from six.moves import queue
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from registration.models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELIVERY_BACKEND = 'registration.delivery.SynchronousDelivery'
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_delivery_backend(path=None):
+    """
+    Returns the shared instance of the configured delivery backend.
+    Instances are kept per process so queue based backends only ever
+    start one set of workers.
+    """
+    path = path or getattr(settings, 'REGISTRATION_DELIVERY_BACKEND',
+                           DEFAULT_DELIVERY_BACKEND)
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
+
+
+def on_commit(func):
+    """
+    Runs ``func`` once the current transaction commits (immediately when
+    there is none). Django 1.8 has no ``on_commit`` hook, so there the
+    function is called straight away.
+    """
+    if hasattr(transaction, 'on_commit'):
+        transaction.on_commit(func)
+    else:
+        func()
+
+
+class BaseDelivery(object):
+    # whether deliver() writes to the database, so callers can make the
+    # write part of their own transaction
+    transactional = False
+
+    def deliver(self, message):
+        """
+        Hands an ``EmailMessage`` to the backend for sending.
+        """
+        raise NotImplementedError
+
+
+class SynchronousDelivery(BaseDelivery):
+    """
+    Sends the message immediately on the calling thread.
+    """
+
+    def deliver(self, message):
+        message.send()
+
+
+class ThreadedDelivery(BaseDelivery):
+    """
+    Queues messages in memory once the transaction commits and sends them
+    from background worker threads, reusing one mail connection for
+    whatever is waiting in the queue.
+
+    Messages still in the queue are lost if the process exits, use
+    ``OutboxDelivery`` when that matters.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or getattr(
+            settings, 'REGISTRATION_DELIVERY_WORKERS', 2)
+        self.queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def deliver(self, message):
+        on_commit(lambda: self.enqueue(message))
+
+    def enqueue(self, message):
+        self._start_workers()
+        self.queue.put(message)
+
+    def join(self):
+        """
+        Blocks until every queued message has been handled.
+        """
+        self.queue.join()
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name="registration-delivery-%d" % len(self._threads))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            messages = [self.queue.get()]
+            while True:
+                try:
+                    messages.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                get_connection().send_messages(messages)
+            except Exception:
+                logger.exception("Failed to send %d activation email(s)",
+                                 len(messages))
+            finally:
+                for _ in messages:
+                    self.queue.task_done()
+
+
+class OutboxDelivery(BaseDelivery):
+    """
+    Stores the message in the ``QueuedEmail`` table as part of the current
+    transaction; ``ActivateUserMixin.create_inactive_user`` delivers inside
+    the transaction creating the user. Rows are sent (and removed) by the
+    ``sendqueuedemail`` management command, so nothing is lost if a
+    process dies.
+    """
+    transactional = True
+
+    def deliver(self, message):
+        QueuedEmail.objects.create_from_message(message)
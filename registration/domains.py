@@ -0,0 +1,123 @@
+"""
+Email domain policy for new registrations.
+
+``REGISTRATION_BLOCKED_DOMAINS_FILE`` points to a text file of domains,
+one per line (blank lines and ``#`` comments are ignored), whose
+addresses may not register. A domain also blocks all of its
+subdomains, so ``example.com`` blocks ``mail.example.com``.
+``REGISTRATION_ALLOWED_DOMAINS_FILE`` lists exceptions in the same
+format: a domain matching both lists is allowed.
+
+The files are read into sets of domain suffixes, so checking an address
+costs one set lookup per label of its domain, however long the lists
+are. Each process checks the files' modification times at most every
+``REGISTRATION_DOMAIN_POLICY_CHECK_INTERVAL`` seconds (60 by default)
+and reloads them when they change, so lists can be updated without a
+restart.
+"""
+import io
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _read_domains(path):
+    domains = set()
+    if not path:
+        return domains
+    with io.open(path, encoding='utf-8') as f:
+        for line in f:
+            domain = line.split('#', 1)[0].strip().lower().strip('.')
+            if domain.startswith('*.'):
+                domain = domain[2:]
+            if domain:
+                domains.add(domain)
+    return domains
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if path else None
+
+
+class DomainPolicy(object):
+    """
+    Blocked and allowed domain suffix sets.
+    """
+
+    def __init__(self, blocked=(), allowed=()):
+        self.blocked = frozenset(blocked)
+        self.allowed = frozenset(allowed)
+
+    @classmethod
+    def from_files(cls, blocked_path=None, allowed_path=None):
+        return cls(_read_domains(blocked_path), _read_domains(allowed_path))
+
+    def _matches(self, suffixes, domain):
+        labels = domain.lower().rstrip('.').split('.')
+        return any('.'.join(labels[i:]) in suffixes
+                   for i in range(len(labels)))
+
+    def is_blocked(self, domain):
+        if not self.blocked or not self._matches(self.blocked, domain):
+            return False
+        return not self._matches(self.allowed, domain)
+
+
+_policy = None
+_policy_paths = None
+_policy_mtimes = None
+_policy_checked = 0
+_policy_lock = threading.Lock()
+
+
+def get_domain_policy():
+    """
+    Returns the process wide ``DomainPolicy``, (re)loading it when the
+    configured files or their modification times changed. When a file
+    can't be read (missing, mid-rename, bad UTF-8) the last good policy
+    stays in use, or an empty one if there is none yet, and loading is
+    retried after the next interval.
+    """
+    global _policy, _policy_paths, _policy_mtimes, _policy_checked
+    paths = (getattr(settings, 'REGISTRATION_BLOCKED_DOMAINS_FILE', None),
+             getattr(settings, 'REGISTRATION_ALLOWED_DOMAINS_FILE', None))
+    interval = getattr(
+        settings, 'REGISTRATION_DOMAIN_POLICY_CHECK_INTERVAL', 60)
+    with _policy_lock:
+        now = time.time()
+        if _policy is not None and _policy_paths == paths and \
+                now - _policy_checked < interval:
+            return _policy
+        _policy_checked = now
+        try:
+            mtimes = tuple(_mtime(path) for path in paths)
+            if _policy_paths != paths or _policy_mtimes != mtimes:
+                _policy = DomainPolicy.from_files(*paths)
+                _policy_paths, _policy_mtimes = paths, mtimes
+        except (IOError, OSError, ValueError):
+            logger.exception("Could not load the email domain policy, "
+                             "keeping the previous one")
+            if _policy is None or _policy_paths != paths:
+                _policy = DomainPolicy()
+                _policy_paths, _policy_mtimes = paths, None
+        return _policy
+
+
+def reset_domain_policy():
+    global _policy, _policy_paths, _policy_mtimes
+    with _policy_lock:
+        _policy = _policy_paths = _policy_mtimes = None
+
+
+def email_domain_blocked(email):
+    """
+    Returns True when the domain of ``email`` may not register.
+    """
+    if '@' not in email:
+        return False
+    return get_domain_policy().is_blocked(email.rsplit('@', 1)[1])
@@ -1,11 +1,22 @@
+import hashlib
+
 from django import forms
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail import get_connection
 from django.core.urlresolvers import reverse
-from django.template.loader import render_to_string
-from django.template import RequestContext
+from django.db import transaction
 
+from registration import domains
 from registration import get_site
+from registration import instrumentation
+from registration import rendering
+from registration import routers
+from registration.delivery import get_delivery_backend
 from registration.models import RegistrationProfile
 
 
@@ -32,64 +43,195 @@ class ActivateUserMixin(object):
         Creates the inactive user and sends activation email. Only call
         when form is valid. Request object is for RequestContext and current
         site to send to templates.
+
+        With a transactional delivery backend (``OutboxDelivery``) the
+        email is stored in the same transaction as the user, otherwise it
+        is handed off once the user is saved.
         """
-        self.user = RegistrationProfile.objects.create_inactive_user(
-            self._get_user_username(),
-            self._get_user_password(),
-            self._get_user_email(), )
-        if send_email:
+        transactional = send_email and getattr(
+            get_delivery_backend(), 'transactional', False)
+        with transaction.atomic():
+            self.user = RegistrationProfile.objects.create_inactive_user(
+                self._get_user_username(),
+                self._get_user_password(),
+                self._get_user_email(), )
+            if transactional:
+                self.request = request
+                self.send_activation_email(self.user)
+        if send_email and not transactional:
             self.request = request
             self.send_activation_email(self.user)
         return self.user
 
     def send_activation_email(self, user):
-        current_site = get_site(self.request)
+        """
+        Hands the activation email to the ``REGISTRATION_DELIVERY_BACKEND``,
+        which may send it right away or after the transaction commits.
+        """
+        with instrumentation.timed('render_email'):
+            message = self.get_activation_email_message(user)
+        with instrumentation.timed('deliver_email'):
+            get_delivery_backend().deliver(message)
 
-        mail_kwargs = {}
-        subject = self._get_activation_subject(current_site)
-        message = self._get_activation_message(current_site,
-                                               self.activation_template_name)
+    def get_activation_email_message(self, user):
+        subject, body, html = self._render_activation_email(
+            get_site(self.request))
+        message = EmailMultiAlternatives(
+            subject, body, settings.DEFAULT_FROM_EMAIL, [user.email])
+        if html is not None:
+            message.attach_alternative(html, 'text/html')
+        return message
 
+    def _render_activation_email(self, site):
+        """
+        Renders subject, text and html (``None`` when there is no html
+        template) from one shared context.
+        """
+        template_names = [self.activation_subject_template_name,
+                          self.activation_template_name]
         if self.activation_html_template_name:
-            mail_kwargs['html_message'] = self._get_activation_message(
-                current_site, self.activation_html_template_name)
-
-        user.email_user(subject, message, settings.DEFAULT_FROM_EMAIL,
-                        **mail_kwargs)
+            template_names.append(self.activation_html_template_name)
+        rendered = rendering.render_templates(
+            template_names, self.get_email_context(site), self.request)
+        subject = ''.join(rendered[0].splitlines())
+        html = rendered[2] if len(rendered) > 2 else None
+        return subject, rendered[1], html
 
     def _get_activation_subject(self, site):
-        subject = render_to_string(
-            self.activation_subject_template_name, {'site': site},
-            RequestContext(self.request))
+        subject, = rendering.render_templates(
+            [self.activation_subject_template_name],
+            self.get_email_context(site), self.request)
         return ''.join(subject.splitlines())
 
     def _get_activation_message(self, site, template_name):
-        return render_to_string(template_name,
-                                self.get_email_context(site),
-                                RequestContext(self.request))
+        message, = rendering.render_templates(
+            [template_name], self.get_email_context(site), self.request)
+        return message
 
-    def _get_activation_url(self, activation_key):
+    def _get_activation_url(self, activation_key, site):
         path = reverse(
             "registration_activate", kwargs={"activation_key": activation_key})
+        if self.request is None:
+            secure = getattr(settings, 'REGISTRATION_USE_HTTPS', False)
+            host = site.domain
+        else:
+            secure = self.request.is_secure()
+            host = self.request.get_host()
         return "{protocol}://{host}{path}".format(
-            protocol="https" if self.request.is_secure() else "http",
-            host=self.request.get_host(),
+            protocol="https" if secure else "http",
+            host=host,
             path=path, )
 
     def get_email_context(self, site):
-        activation_key = self.user.registrationprofile.activation_key
+        activation_key = RegistrationProfile.objects.get_activation_token(
+            self.user.registrationprofile.activation_key)
         return dict({
             'site':
             site,
             'activation_key':
             activation_key,
             'activation_url':
-            self._get_activation_url(activation_key),
+            self._get_activation_url(activation_key, site),
             'expiration_days':
             settings.ACCOUNT_ACTIVATION_DAYS,
         }, **self.cleaned_data)
 
 
+class ActivationEmail(ActivateUserMixin):
+    """
+    Builds the activation email for an existing user outside of the
+    registration form, e.g. when resending it from the admin.
+    """
+
+    def __init__(self, user, request=None):
+        self.user = user
+        self.request = request
+        self.cleaned_data = {
+            'username': user.get_username(),
+            'email': user.email,
+        }
+
+
+def resend_activation_emails(profiles, request=None, batch_size=100):
+    """
+    Resends the activation email for every profile in the ``profiles``
+    queryset whose key is still usable, reusing one mail connection and
+    sending ``batch_size`` messages at a time. Returns a ``(sent, skipped)``
+    tuple, where skipped counts expired or already activated profiles.
+    Without a ``request`` the link domain comes from the current Site, so
+    ``django.contrib.sites`` must be installed.
+    """
+    if request is None and not apps.is_installed('django.contrib.sites'):
+        raise ImproperlyConfigured(
+            "Resending activation emails without a request needs "
+            "django.contrib.sites in INSTALLED_APPS.")
+    total = profiles.count()
+    pending = profiles.unexpired().select_related('user').order_by('pk')
+    sent = processed = 0
+    last_pk = None
+    connection = get_connection()
+    connection.open()
+    try:
+        while True:
+            batch = pending if last_pk is None else pending.filter(
+                pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            messages = []
+            for profile in batch:
+                message = ActivationEmail(
+                    profile.user, request).get_activation_email_message(
+                        profile.user)
+                message.connection = connection
+                messages.append(message)
+            sent += connection.send_messages(messages) or 0
+            processed += len(batch)
+            last_pk = batch[-1].pk
+    finally:
+        connection.close()
+    return sent, total - processed
+
+
+class ResendActivationForm(forms.Form):
+    """
+    Resends the activation email to pending registrations for an email
+    address.
+
+    Each address gets at most one resend per
+    ``REGISTRATION_RESEND_COOLDOWN`` seconds (300 by default), tracked in
+    the cache; repeated submissions within that window don't touch the
+    database or the mail backend. Whether an account exists is never
+    revealed.
+    """
+    email = forms.EmailField(max_length=75)
+
+    def _cooldown_key(self, email):
+        return "registration:resend:%s" % hashlib.sha1(
+            email.lower().encode('utf-8')).hexdigest()
+
+    def get_pending_profiles(self, email):
+        return RegistrationProfile.objects.using(
+            routers.read_database()).unexpired().select_related(
+                'user').filter(user__email__iexact=email)
+
+    def resend(self, request=None):
+        """
+        Sends the activation emails, returning how many were sent (zero
+        while the address is cooling down).
+        """
+        email = self.cleaned_data['email']
+        if not cache.add(self._cooldown_key(email), True, getattr(
+                settings, 'REGISTRATION_RESEND_COOLDOWN', 300)):
+            return 0
+        sent = 0
+        for profile in self.get_pending_profiles(email):
+            ActivationEmail(profile.user, request).send_activation_email(
+                profile.user)
+            sent += 1
+        return sent
+
+
 class RegistrationForm(ActivateUserMixin, forms.Form):
     username = forms.RegexField(
         regex=r'^[\w.@+-]+$',
@@ -104,16 +246,29 @@ class RegistrationForm(ActivateUserMixin, forms.Form):
     password1 = forms.CharField(widget=forms.PasswordInput())
     password2 = forms.CharField(widget=forms.PasswordInput())
 
+    username_unavailable_message = "Username '%(username)s' is not available."
+    email_domain_blocked_message = "Email addresses from this domain " \
+                                   "can't be used to register."
+
     def clean_username(self):
-        user_model = get_user_model()
-        try:
-            username_lookup = "{}__iexact".format(user_model.USERNAME_FIELD)
-            user_model.objects.get(
-                **{username_lookup: self.cleaned_data['username']})
-        except user_model.DoesNotExist:
+        # clean_email rejects these; don't spend a query on them first
+        if domains.email_domain_blocked(
+                self.data.get(self.add_prefix('email'), '')):
             return self.cleaned_data['username']
-        raise forms.ValidationError(
-            "Username '%(username)s' is not available." % self.cleaned_data)
+        user_model = get_user_model()
+        username_lookup = "{}__iexact".format(user_model.USERNAME_FIELD)
+        # on the default database: a lagging replica would let a double
+        # submitted registration through to the INSERT
+        if user_model.objects.filter(
+                **{username_lookup: self.cleaned_data['username']}).exists():
+            raise forms.ValidationError(
+                self.username_unavailable_message % self.cleaned_data)
+        return self.cleaned_data['username']
+
+    def clean_email(self):
+        if domains.email_domain_blocked(self.cleaned_data['email']):
+            raise forms.ValidationError(self.email_domain_blocked_message)
+        return self.cleaned_data['email']
 
     def clean(self):
         password1 = self.cleaned_data.get('password1')
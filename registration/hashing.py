@@ -0,0 +1,75 @@
+"""
+Optional process pool for hashing passwords of bulk imports.
+
+Setting ``REGISTRATION_PASSWORD_HASHING_PROCESSES`` to a number of worker
+processes makes ``RegistrationManager.bulk_create_inactive_users`` hash
+each batch in parallel across a bounded ``multiprocessing`` pool, created
+on first use. Single registrations never use it: PBKDF2 already releases
+the GIL, so handing one hash to another process only adds IPC while the
+request waits all the same.
+
+Enable it for management commands and import jobs rather than web
+processes: the pool is forked from the calling process, which is unsafe
+in a multi-threaded server. Under the ``spawn`` start method each worker
+runs ``django.setup()`` from ``DJANGO_SETTINGS_MODULE``, so settings
+overridden at runtime don't reach the workers.
+"""
+import atexit
+import threading
+import multiprocessing
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_pool = None
+_pool_processes = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the shared hashing pool, or None when it is not configured.
+    """
+    global _pool, _pool_processes
+    processes = getattr(
+        settings, 'REGISTRATION_PASSWORD_HASHING_PROCESSES', None)
+    with _lock:
+        if processes != _pool_processes:
+            _close_pool()
+            if processes:
+                _pool = multiprocessing.Pool(
+                    processes, initializer=_init_worker)
+            _pool_processes = processes
+        return _pool
+
+
+def _init_worker():
+    # a no-op when forked, configures settings when spawned
+    django.setup()
+
+
+def close_pool():
+    with _lock:
+        _close_pool()
+
+
+def _close_pool():
+    global _pool, _pool_processes
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+    _pool = _pool_processes = None
+
+
+atexit.register(close_pool)
+
+
+def make_passwords(passwords):
+    """
+    Hashes ``passwords``, in parallel when the pool is configured.
+    """
+    pool = get_pool()
+    if pool is None:
+        return [hashers.make_password(password) for password in passwords]
+    return pool.map(hashers.make_password, passwords)
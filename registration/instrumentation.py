@@ -0,0 +1,190 @@
+"""
+Per-stage timing of the registration pipeline.
+
+Stages of registration (``user_insert``, ``profile_insert``,
+``render_email``, ``deliver_email``) and activation (``activate_user``)
+are wrapped in ``timed``, which measures wall time and database queries
+and hands them to:
+
+* the ``stage_timed`` signal, for any connected receivers, and
+* the sink named by ``REGISTRATION_INSTRUMENTATION_SINK``, a dotted path
+  to a class with a ``record(stage, duration, queries)`` method, such as
+  ``LoggingSink``, ``StatsdSink`` or ``MemorySink`` below.
+
+With no sink configured and no receivers nothing is measured.
+"""
+import contextlib
+import logging
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+stage_timed = Signal(providing_args=['stage', 'duration', 'queries'])
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_sink():
+    """
+    Returns the shared instance of the configured sink, or None.
+    """
+    path = getattr(settings, 'REGISTRATION_INSTRUMENTATION_SINK', None)
+    if not path:
+        return None
+    with _sinks_lock:
+        if path not in _sinks:
+            _sinks[path] = import_string(path)()
+        return _sinks[path]
+
+
+class _CountingCursor(object):
+    """
+    Wraps a connection's cursor, counting executed statements in every
+    active ``timed`` block.
+    """
+
+    def __init__(self, cursor, counters):
+        self.cursor = cursor
+        self.counters = counters
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.cursor.__exit__(*exc_info)
+
+    def _count(self):
+        for counter in self.counters:
+            counter[0] += 1
+
+    def execute(self, *args, **kwargs):
+        self._count()
+        return self.cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._count()
+        return self.cursor.executemany(*args, **kwargs)
+
+    def callproc(self, *args, **kwargs):
+        self._count()
+        return self.cursor.callproc(*args, **kwargs)
+
+
+def _counting(make_cursor, counters):
+    def wrapper(cursor):
+        cursor = make_cursor(cursor)
+        if counters:
+            return _CountingCursor(cursor, counters)
+        return cursor
+    return wrapper
+
+
+def _query_counters(connection):
+    """
+    Returns the list of active counters of ``connection``, wrapping its
+    cursor factories the first time. Django 1.8 - 1.11 have no
+    ``execute_wrapper``; counting here avoids turning on the debug query
+    log, whose bounded size makes counts drop to zero once it fills.
+    """
+    counters = connection.__dict__.get('_registration_query_counters')
+    if counters is None:
+        counters = connection._registration_query_counters = []
+        for name in ('make_cursor', 'make_debug_cursor'):
+            setattr(connection, name,
+                    _counting(getattr(connection, name), counters))
+    return counters
+
+
+@contextlib.contextmanager
+def timed(stage, using=DEFAULT_DB_ALIAS):
+    """
+    Measures the wrapped block as ``stage``: duration in seconds and the
+    number of queries run on the ``using`` database.
+    """
+    sink = get_sink()
+    if sink is None and not stage_timed.has_listeners():
+        yield
+        return
+
+    counters = _query_counters(connections[using])
+    counter = [0]
+    counters.append(counter)
+    start = time.time()
+    try:
+        yield
+    finally:
+        duration = time.time() - start
+        counters.remove(counter)
+        queries = counter[0]
+        if sink is not None:
+            sink.record(stage, duration, queries)
+        stage_timed.send(sender=None, stage=stage, duration=duration,
+                         queries=queries)
+
+
+class LoggingSink(object):
+    """
+    Logs each stage at INFO level on the ``registration.instrumentation``
+    logger.
+    """
+
+    def record(self, stage, duration, queries):
+        logger.info("registration stage %s took %.2fms with %d queries",
+                    stage, duration * 1000, queries)
+
+
+class StatsdSink(object):
+    """
+    Sends statsd timers (milliseconds) and query counters over UDP to
+    ``REGISTRATION_STATSD_HOST``:``REGISTRATION_STATSD_PORT``, prefixed
+    with ``REGISTRATION_STATSD_PREFIX``.
+    """
+
+    def __init__(self):
+        self.address = (
+            getattr(settings, 'REGISTRATION_STATSD_HOST', '127.0.0.1'),
+            getattr(settings, 'REGISTRATION_STATSD_PORT', 8125))
+        self.prefix = getattr(settings, 'REGISTRATION_STATSD_PREFIX',
+                              'registration')
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def record(self, stage, duration, queries):
+        packet = "{0}.{1}.duration:{2:.3f}|ms\n{0}.{1}.queries:{3}|c".format(
+            self.prefix, stage, duration * 1000, queries)
+        try:
+            self.socket.sendto(packet.encode('utf-8'), self.address)
+        except socket.error:
+            logger.debug("Could not send stats for stage %s", stage)
+
+
+class MemorySink(object):
+    """
+    Keeps ``(stage, duration, queries)`` tuples in ``records``, for tests.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, stage, duration, queries):
+        self.records.append((stage, duration, queries))
+
+    def stages(self):
+        return [record[0] for record in self.records]
+
+    def clear(self):
+        del self.records[:]
@@ -0,0 +1,75 @@
+"""
+Activation key generators.
+
+``REGISTRATION_KEY_GENERATOR`` is the dotted path to a callable taking the
+new user and returning its activation key: at most 40 characters matching
+the activation URL (letters, digits, ``-`` and ``_``). The default draws
+30 bytes from ``os.urandom`` and encodes them as 40 URL-safe base64
+characters in a single call.
+"""
+import base64
+import os
+import random
+import threading
+from hashlib import sha1
+
+import six
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+KEY_BYTES = 30
+DEFAULT_KEY_GENERATOR = 'registration.keys.default_key_generator'
+
+
+def default_key_generator(user=None):
+    return base64.urlsafe_b64encode(os.urandom(KEY_BYTES)).decode('ascii')
+
+
+def sha1_key_generator(user):
+    """
+    The original key format: SHA1 of a short random salt and the username.
+    Not cryptographically strong, kept for installs that depend on it.
+    """
+    salt = sha1(six.text_type(
+        random.random()).encode("utf-8")).hexdigest()[:5]
+    return sha1(
+        six.text_type(salt + user.username).encode('utf-8')).hexdigest()
+
+
+class KeyPool(object):
+    """
+    Generates keys ``size`` at a time from one ``os.urandom`` call and
+    hands them out one by one, for batch imports creating many users.
+
+    A forked child would otherwise hand out the same keys as its parent,
+    so keys left over from another process are thrown away.
+    """
+
+    def __init__(self, size=1000):
+        self.size = size
+        self._keys = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __call__(self, user=None):
+        with self._lock:
+            if not self._keys or self._pid != os.getpid():
+                self._refill()
+            return self._keys.pop()
+
+    def _refill(self):
+        self._pid = os.getpid()
+        key_length = KEY_BYTES * 4 // 3
+        encoded = base64.urlsafe_b64encode(
+            os.urandom(KEY_BYTES * self.size)).decode('ascii')
+        self._keys = [encoded[i:i + key_length]
+                      for i in range(0, len(encoded), key_length)]
+
+
+pooled_key_generator = KeyPool()
+
+
+def get_key_generator():
+    return import_string(getattr(
+        settings, 'REGISTRATION_KEY_GENERATOR', DEFAULT_KEY_GENERATOR))
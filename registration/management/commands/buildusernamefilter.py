@@ -0,0 +1,23 @@
+"""
+A management command which builds the Bloom filter of taken usernames
+used by the registration form's live availability check.
+
+Run it from cron more often than
+``REGISTRATION_AVAILABILITY_FILTER_TIMEOUT`` seconds; until it has run,
+every availability check queries the database.
+
+"""
+
+from django.core.management.base import BaseCommand
+
+from registration import availability
+
+
+class Command(BaseCommand):
+    help = "Build the username availability filter and store it in the cache"
+
+    def handle(self, **options):
+        count = availability.build_username_filter()
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                "Built the username filter from %d user(s)." % count)
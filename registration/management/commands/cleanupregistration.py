@@ -2,18 +2,59 @@
 A management command which deletes expired accounts (e.g.,
 accounts which signed up but never activated) from the database.
 
-Calls ``RegistrationProfile.objects.delete_expired_users()``, which
-contains the actual logic for determining which accounts are deleted.
+Walks ``RegistrationProfile.objects.expired_user_batches()``, which
+contains the actual logic for determining which accounts are deleted,
+one batch at a time so the job can be watched, throttled and stopped.
 
 """
+import time
 
-from django.core.management.base import NoArgsCommand
+from django.core.management.base import BaseCommand
 
 from registration.models import RegistrationProfile
 
 
-class Command(NoArgsCommand):
+class Command(BaseCommand):
     help = "Delete expired user registrations from the database"
 
-    def handle_noargs(self, **options):
-        RegistrationProfile.objects.delete_expired_users()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help="Number of users deleted per statement "
+                 "(default: REGISTRATION_CLEANUP_BATCH_SIZE or 1000).")
+        parser.add_argument(
+            '--max-seconds', type=float, default=None,
+            help="Stop after the batch that goes over this many seconds.")
+        parser.add_argument(
+            '--sleep-between-batches', type=float, default=0,
+            help="Seconds to pause after each batch, e.g. to let replicas "
+                 "catch up.")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only count the users that would be deleted.")
+
+    def handle(self, **options):
+        manager = RegistrationProfile.objects
+        verb = "Found" if options['dry_run'] else "Deleted"
+        started = time.time()
+        total = 0
+        for user_ids in manager.expired_user_batches(options['batch_size']):
+            if not options['dry_run']:
+                manager.delete_users(user_ids)
+            total += len(user_ids)
+            self.log(options, 2, "%s %d expired user(s) so far." % (
+                verb, total))
+
+            elapsed = time.time() - started
+            if options['max_seconds'] is not None and \
+                    elapsed >= options['max_seconds']:
+                self.log(options, 1, "Stopping after %.1f seconds." % elapsed)
+                break
+            if options['sleep_between_batches']:
+                time.sleep(options['sleep_between_batches'])
+
+        self.log(options, 1, "%s %d expired user(s)." % (verb, total))
+
+    def log(self, options, verbosity, message):
+        if options['verbosity'] >= verbosity:
+            self.stdout.write(message)
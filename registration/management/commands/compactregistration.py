@@ -0,0 +1,52 @@
+"""
+A management command which deletes the profiles of activated users,
+leaving only pending registrations in the profile table.
+
+Activation replaces a profile's key with ``ALREADY_ACTIVATED`` and keeps
+the row; run this periodically, or set
+``REGISTRATION_DELETE_ACTIVATED_PROFILES = True`` to delete profiles on
+activation instead. Users themselves are never touched.
+
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from registration.models import RegistrationProfile
+
+
+class Command(BaseCommand):
+    help = "Delete the registration profiles of activated users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help="Number of profiles deleted per statement "
+                 "(default: REGISTRATION_CLEANUP_BATCH_SIZE or 1000).")
+        parser.add_argument(
+            '--sleep-between-batches', type=float, default=0,
+            help="Seconds to pause after each batch, e.g. to let replicas "
+                 "catch up.")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only count the profiles that would be deleted.")
+
+    def handle(self, **options):
+        manager = RegistrationProfile.objects
+        verb = "Found" if options['dry_run'] else "Deleted"
+        total = 0
+        for profile_ids in manager.activated_profile_batches(
+                options['batch_size']):
+            if not options['dry_run']:
+                manager.filter(pk__in=profile_ids).delete()
+            total += len(profile_ids)
+            self.log(options, 2, "%s %d activated profile(s) so far." % (
+                verb, total))
+            if options['sleep_between_batches']:
+                time.sleep(options['sleep_between_batches'])
+
+        self.log(options, 1, "%s %d activated profile(s)." % (verb, total))
+
+    def log(self, options, verbosity, message):
+        if options['verbosity'] >= verbosity:
+            self.stdout.write(message)
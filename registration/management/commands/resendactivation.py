@@ -0,0 +1,39 @@
+"""
+A management command which resends the activation email to every
+registration whose activation key has not expired yet.
+
+Emails are built without a request, so the activation links use the
+current ``django.contrib.sites`` Site domain (and ``https`` when
+``REGISTRATION_USE_HTTPS`` is set).
+
+"""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from registration.forms import resend_activation_emails
+from registration.models import RegistrationProfile
+
+
+class Command(BaseCommand):
+    help = "Resend activation emails to pending user registrations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Number of emails sent per batch (default: 100).")
+
+    def handle(self, **options):
+        if not apps.is_installed('django.contrib.sites'):
+            raise CommandError(
+                "resendactivation needs django.contrib.sites in "
+                "INSTALLED_APPS: without a request, the domain for "
+                "activation links comes from the current Site.")
+        sent, skipped = resend_activation_emails(
+            RegistrationProfile.objects.exclude(
+                activation_key=RegistrationProfile.ACTIVATED),
+            batch_size=options['batch_size'])
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                "Sent %d activation email(s), skipped %d." % (sent, skipped))
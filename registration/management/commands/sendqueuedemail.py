@@ -0,0 +1,26 @@
+"""
+A management command which sends activation emails stored by
+``registration.delivery.OutboxDelivery``.
+
+Run it from cron or a process supervisor as often as emails should go out.
+
+"""
+
+from django.core.management.base import BaseCommand
+
+from registration.models import QueuedEmail
+
+
+class Command(BaseCommand):
+    help = "Send activation emails waiting in the registration outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Number of emails sent per batch (default: 100).")
+
+    def handle(self, **options):
+        sent = QueuedEmail.objects.send_queued(
+            batch_size=options['batch_size'])
+        if options['verbosity'] > 0:
+            self.stdout.write("Sent %d queued email(s)." % sent)
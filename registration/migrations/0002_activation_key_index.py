@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+INDEX_NAME = 'registration_activation_key_idx'
+LIKE_INDEX_NAME = 'registration_activation_key_like_idx'
+
+
+def _concurrently(schema_editor):
+    # See 0004_username_upper_index.
+    if schema_editor.connection.in_atomic_block:
+        return ""
+    return "CONCURRENTLY "
+
+
+def _fields(apps):
+    RegistrationProfile = apps.get_model('registration',
+                                         'RegistrationProfile')
+    plain = models.CharField(max_length=40)
+    plain.set_attributes_from_name('activation_key')
+    indexed = models.CharField(max_length=40, db_index=True)
+    indexed.set_attributes_from_name('activation_key')
+    return RegistrationProfile, plain, indexed
+
+
+def create_activation_key_index(apps, schema_editor):
+    """
+    On PostgreSQL the two indexes ``db_index`` would create are built
+    concurrently under fixed names, so large tables stay writable and
+    0010 can drop them again; elsewhere the field is altered as usual.
+    """
+    model, plain, indexed = _fields(apps)
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.alter_field(model, plain, indexed)
+        return
+    quote = schema_editor.quote_name
+    table, column = quote(model._meta.db_table), quote('activation_key')
+    schema_editor.execute("CREATE INDEX %sIF NOT EXISTS %s ON %s (%s)" % (
+        _concurrently(schema_editor), INDEX_NAME, table, column))
+    schema_editor.execute(
+        "CREATE INDEX %sIF NOT EXISTS %s ON %s (%s varchar_pattern_ops)" % (
+            _concurrently(schema_editor), LIKE_INDEX_NAME, table, column))
+
+
+def drop_activation_key_index(apps, schema_editor):
+    model, plain, indexed = _fields(apps)
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.alter_field(model, indexed, plain)
+        return
+    for name in (INDEX_NAME, LIKE_INDEX_NAME):
+        schema_editor.execute("DROP INDEX %sIF EXISTS %s" % (
+            _concurrently(schema_editor), name))
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('registration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_activation_key_index,
+                                     drop_activation_key_index),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='registrationprofile',
+                    name='activation_key',
+                    field=models.CharField(max_length=40, db_index=True),
+                ),
+            ],
+        ),
+    ]
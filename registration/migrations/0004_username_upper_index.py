@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import migrations
+
+INDEX_NAME = 'registration_username_upper_idx'
+
+
+def _username_index_target(apps, schema_editor):
+    """
+    Returns the quoted table and column of the username field when the
+    index should be created, otherwise None.
+
+    Only PostgreSQL needs it: there ``__iexact`` compiles to
+    ``UPPER(column::text) = UPPER(%s)``, which can't use the plain username
+    index. Set ``REGISTRATION_CREATE_USERNAME_INDEX = False`` to skip it.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return None
+    if not getattr(settings, 'REGISTRATION_CREATE_USERNAME_INDEX', True):
+        return None
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    field = user_model._meta.get_field(get_user_model().USERNAME_FIELD)
+    quote = schema_editor.quote_name
+    return quote(user_model._meta.db_table), quote(field.column)
+
+
+def _concurrently(schema_editor):
+    # Django < 1.10 ignores Migration.atomic and PostgreSQL refuses
+    # CONCURRENTLY inside a transaction, so fall back to a plain build there.
+    if schema_editor.connection.in_atomic_block:
+        return ""
+    return "CONCURRENTLY "
+
+
+def create_username_index(apps, schema_editor):
+    target = _username_index_target(apps, schema_editor)
+    if target is not None:
+        schema_editor.execute(
+            "CREATE INDEX %sIF NOT EXISTS %s ON %s ((UPPER(%s::text)))" % (
+                (_concurrently(schema_editor), INDEX_NAME) + target))
+
+
+def drop_username_index(apps, schema_editor):
+    if _username_index_target(apps, schema_editor) is not None:
+        schema_editor.execute("DROP INDEX %sIF EXISTS %s" % (
+            _concurrently(schema_editor), INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('registration', '0003_queuedemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
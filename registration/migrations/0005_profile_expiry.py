@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 250
+
+
+def backfill_expires_at(apps, schema_editor):
+    """
+    Sets expires_at from the user's date_joined, BATCH_SIZE profiles per
+    UPDATE. The migration isn't atomic, so on databases with autocommit
+    each batch commits on its own and no long lock is held.
+    """
+    RegistrationProfile = apps.get_model('registration',
+                                         'RegistrationProfile')
+    period = datetime.timedelta(
+        days=getattr(settings, 'ACCOUNT_ACTIVATION_DAYS', 7))
+    profiles = RegistrationProfile.objects.using(
+        schema_editor.connection.alias).filter(expires_at__isnull=True)
+    last_pk = 0
+    while True:
+        rows = list(profiles.filter(pk__gt=last_pk).order_by('pk').values_list(
+            'pk', 'user__date_joined')[:BATCH_SIZE])
+        if not rows:
+            return
+        profiles.filter(pk__in=[pk for pk, _ in rows]).update(
+            expires_at=models.Case(
+                *[models.When(pk=pk, then=models.Value(joined + period))
+                  for pk, joined in rows],
+                output_field=models.DateTimeField()))
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('registration', '0004_username_upper_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrationprofile',
+            name='activated_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='registrationprofile',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
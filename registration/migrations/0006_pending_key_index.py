@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'registration_pending_key_idx'
+ACTIVATED = 'ALREADY_ACTIVATED'
+
+
+def _pending_index_supported(schema_editor):
+    """
+    Only PostgreSQL gets the index: psycopg2 sends parameters inline, so
+    the planner can match the ORM's ``NOT (activation_key = ...)`` with
+    the index predicate. SQLite binds the parameter and never would. Set
+    ``REGISTRATION_CREATE_PENDING_KEY_INDEX = False`` to skip it.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    return getattr(settings, 'REGISTRATION_CREATE_PENDING_KEY_INDEX', True)
+
+
+def _concurrently(schema_editor):
+    # See 0004_username_upper_index.
+    if schema_editor.connection.in_atomic_block:
+        return ""
+    return "CONCURRENTLY "
+
+
+def create_pending_key_index(apps, schema_editor):
+    """
+    Indexes only the keys of pending registrations, so activation lookups
+    (which always exclude the ALREADY_ACTIVATED sentinel) walk an index
+    sized by outstanding signups instead of by every user ever activated.
+    """
+    if not _pending_index_supported(schema_editor):
+        return
+    RegistrationProfile = apps.get_model('registration',
+                                         'RegistrationProfile')
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        "CREATE INDEX %sIF NOT EXISTS %s ON %s (%s) WHERE %s <> '%s'" % (
+            _concurrently(schema_editor), INDEX_NAME,
+            quote(RegistrationProfile._meta.db_table),
+            quote('activation_key'), quote('activation_key'), ACTIVATED))
+
+
+def drop_pending_key_index(apps, schema_editor):
+    if _pending_index_supported(schema_editor):
+        schema_editor.execute("DROP INDEX %sIF EXISTS %s" % (
+            _concurrently(schema_editor), INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('registration', '0005_profile_expiry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pending_key_index,
+                             drop_pending_key_index),
+    ]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'registration_email_upper_idx'
+
+
+def _email_index_target(apps, schema_editor):
+    """
+    Returns the quoted table and email column of the user model when the
+    index should be created, otherwise None.
+
+    The resend activation form looks registrations up with
+    ``email__iexact``, which PostgreSQL compiles to
+    ``UPPER(column::text) = UPPER(%s)``. Set
+    ``REGISTRATION_CREATE_EMAIL_INDEX = False`` to skip it.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return None
+    if not getattr(settings, 'REGISTRATION_CREATE_EMAIL_INDEX', True):
+        return None
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    field = user_model._meta.get_field('email')
+    quote = schema_editor.quote_name
+    return quote(user_model._meta.db_table), quote(field.column)
+
+
+def _concurrently(schema_editor):
+    # See 0004_username_upper_index.
+    if schema_editor.connection.in_atomic_block:
+        return ""
+    return "CONCURRENTLY "
+
+
+def create_email_index(apps, schema_editor):
+    target = _email_index_target(apps, schema_editor)
+    if target is not None:
+        schema_editor.execute(
+            "CREATE INDEX %sIF NOT EXISTS %s ON %s ((UPPER(%s::text)))" % (
+                (_concurrently(schema_editor), INDEX_NAME) + target))
+
+
+def drop_email_index(apps, schema_editor):
+    if _email_index_target(apps, schema_editor) is not None:
+        schema_editor.execute("DROP INDEX %sIF EXISTS %s" % (
+            _concurrently(schema_editor), INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('registration', '0006_pending_key_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+def backfill_expires_at(apps, schema_editor):
+    """
+    Fills expires_at on profiles written by code still running during the
+    upgrade to 0005, after its back-fill ran.
+    """
+    import_module('registration.migrations.0005_profile_expiry') \
+        .backfill_expires_at(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('registration', '0007_email_upper_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='registrationprofile',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from importlib import import_module
+
+from django.db import migrations
+
+key_index = import_module('registration.migrations.0002_activation_key_index')
+pending_key_index = import_module(
+    'registration.migrations.0006_pending_key_index')
+
+
+def drop_full_index(apps, schema_editor):
+    """
+    Where the partial index of 0006 exists, the indexes 0002 built over
+    every key, activated or not, are dropped; elsewhere they're the only
+    ones and stay. The partial index is made sure of first, so lookups
+    always have one to use.
+    """
+    if not pending_key_index._pending_index_supported(schema_editor):
+        return
+    pending_key_index.create_pending_key_index(apps, schema_editor)
+    for name in (key_index.INDEX_NAME, key_index.LIKE_INDEX_NAME):
+        schema_editor.execute("DROP INDEX %sIF EXISTS %s" % (
+            key_index._concurrently(schema_editor), name))
+
+
+def restore_full_index(apps, schema_editor):
+    if pending_key_index._pending_index_supported(schema_editor):
+        key_index.create_activation_key_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('registration', '0009_queuedemail_claim'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_full_index, restore_full_index),
+    ]
@@ -1,85 +1,486 @@
 import datetime
-import six
-import random
-from hashlib import sha1
+import uuid
 
 from django.db import models
+from django.db import router
 from django.db import transaction
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail import get_connection
+from django.core import signing
 from django.utils.timezone import now as utc_now
 
+from registration import availability
+from registration import hashing
+from registration import instrumentation
+from registration import keys
+from registration import routers
+from registration import signals
 
-class RegistrationManager(models.Manager):
+
+def activation_period():
+    return datetime.timedelta(days=settings.ACCOUNT_ACTIVATION_DAYS)
+
+
+def _delete_on_activation():
+    return getattr(settings, 'REGISTRATION_DELETE_ACTIVATED_PROFILES', False)
+
+
+def _mark_taken_on_commit(usernames):
+    # a rolled back registration must not leave its usernames marked taken
+    from registration.delivery import on_commit
+    on_commit(lambda: availability.mark_taken(*usernames))
+
+
+class RegistrationQuerySet(models.QuerySet):
+
+    def expired(self):
+        """
+        Profiles of inactive users whose activation window has passed.
+        """
+        return self.filter(
+            expires_at__lte=utc_now(),
+            user__is_active=False,
+        ).exclude(activation_key=self.model.ACTIVATED)
+
+    def unexpired(self):
+        """
+        Profiles whose activation key can still be used.
+        """
+        return self.filter(expires_at__gt=utc_now()).exclude(
+            activation_key=self.model.ACTIVATED)
+
+    def annotate_expired(self):
+        """
+        Adds an ``is_expired`` boolean computed in SQL, matching
+        ``RegistrationProfile.activation_key_expired``.
+        """
+        return self.annotate(is_expired=models.Case(
+            models.When(
+                models.Q(activation_key=self.model.ACTIVATED) |
+                models.Q(expires_at__lte=utc_now()),
+                then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField()))
+
+
+class RegistrationManager(models.Manager.from_queryset(RegistrationQuerySet)):
     """Provides shortcuts to account creation and activation"""
 
     @transaction.atomic
     def create_inactive_user(self, username, password, email, **kwargs):
-        new_user = self._get_new_inactive_user(username, password, email,
-                                               **kwargs)
-        self._create_profile(new_user)
+        with instrumentation.timed('user_insert'):
+            new_user = self._get_new_inactive_user(username, password, email,
+                                                   **kwargs)
+        with instrumentation.timed('profile_insert'):
+            self._create_profile(new_user)
+        _mark_taken_on_commit([new_user.get_username()])
         return new_user
 
     def activate_user(self, activation_key):
         """
         returns user object if successful, otherwise returns false
+
+        Concurrent calls with the same key (double clicks, mail scanners
+        following links) are safe: the profile is claimed with a
+        conditional UPDATE, so only one call writes and sends
+        ``user_activated``; the others return False. With
+        ``REGISTRATION_DELETE_ACTIVATED_PROFILES`` on, the claimed profile
+        is then deleted in the same transaction.
+
+        The key is looked up on ``REGISTRATION_READ_DATABASE``; the claim
+        and the user update go to the default database. A key missing
+        from the replica is looked up again on the default database, as
+        the link may be opened (on another device, say) before the
+        replica has caught up; the ``activate_ip`` rate limit bounds what
+        invalid keys cost there.
+        """
+        with instrumentation.timed('activate_user'):
+            profile = self._get_pending_profile(activation_key)
+            if profile is None:
+                return False
+            with transaction.atomic():
+                if not self._claim_profile(profile):
+                    return False
+                if _delete_on_activation():
+                    self.filter(pk=profile.pk).delete()
+                active_user = self._do_activate_user(profile.user)
+        signals.user_activated.send(sender=self.model, user=active_user)
+        return active_user
+
+    @transaction.atomic
+    def activate_users(self, activation_keys, batch_size=500):
+        """
+        Activates the users behind many activation keys at once. Each batch
+        of ``batch_size`` keys is validated with one query and applied with
+        one UPDATE for the users and one for the profiles, all inside one
+        transaction. Returns the keys that activated a user.
+        """
+        activation_keys = list(activation_keys)
+        activated = []
+        for start in range(0, len(activation_keys), batch_size):
+            keys_by_user = dict(self.select_for_update().filter(
+                activation_key__in=activation_keys[start:start + batch_size],
+            ).unexpired().values_list('user_id', 'activation_key'))
+            self._bulk_activate(list(keys_by_user))
+            activated.extend(keys_by_user.values())
+        return activated
+
+    @transaction.atomic
+    def activate_profiles(self, profiles):
         """
+        Activates every user whose profile in the ``profiles`` queryset is
+        still usable, with one UPDATE for the users and one for the
+        profiles. Returns the ids of the activated users.
+        """
+        user_ids = list(profiles.select_for_update().unexpired().values_list(
+            'user_id', flat=True))
+        self._bulk_activate(user_ids)
+        return user_ids
+
+    def _bulk_activate(self, user_ids):
+        """
+        Activates ``user_ids``, whose profiles the caller has locked with
+        ``select_for_update``, and sends ``user_activated`` for each.
+        """
+        if not user_ids:
+            return
+        users = get_user_model().objects.filter(pk__in=user_ids)
+        users.update(is_active=True)
+        profiles = self.filter(user_id__in=user_ids)
+        if _delete_on_activation():
+            profiles.delete()
+        else:
+            profiles.update(
+                activation_key=self.model.ACTIVATED, activated_at=utc_now())
+        if signals.user_activated.has_listeners(self.model):
+            for user in users:
+                signals.user_activated.send(sender=self.model, user=user)
+
+    def get_activation_token(self, activation_key):
+        """
+        Returns the value to put in activation links for ``activation_key``.
+        With ``REGISTRATION_SIGNED_ACTIVATION_KEYS`` on this is the key
+        signed with a timestamp, otherwise the key itself.
+        """
+        if not getattr(settings, 'REGISTRATION_SIGNED_ACTIVATION_KEYS',
+                       False):
+            return activation_key
+        return signing.TimestampSigner(
+            salt=self.model.ACTIVATION_TOKEN_SALT).sign(activation_key)
+
+    def resolve_activation_token(self, token):
+        """
+        Returns the activation key carried by ``token``, or None when
+        signed keys are on and the token is malformed, forged or older than
+        ``ACCOUNT_ACTIVATION_DAYS``. Never touches the database.
+        """
+        if not getattr(settings, 'REGISTRATION_SIGNED_ACTIVATION_KEYS',
+                       False):
+            return token
         try:
-            profile = self.get(activation_key=activation_key)
-        except self.model.DoesNotExist:
-            return False
-        if not profile.activation_key_expired():
-            active_user = self._do_activate_user(profile.user)
-            self._do_activate_profile(profile)
-            return active_user
-        return False
+            return signing.TimestampSigner(
+                salt=self.model.ACTIVATION_TOKEN_SALT).unsign(
+                    token, max_age=settings.ACCOUNT_ACTIVATION_DAYS * 86400)
+        except signing.BadSignature:
+            return None
 
-    def delete_expired_users(self):
+    def delete_expired_users(self, batch_size=None):
         """
-        Deletes inactive users with expired profiles.
+        Deletes inactive users with expired profiles, ``batch_size`` users
+        at a time. Returns the number of users deleted.
         """
-        for profile in self.filter(user__is_active=False).exclude(
-                activation_key=RegistrationProfile.ACTIVATED):
-            if profile.activation_key_expired():
-                profile.user.delete()
+        deleted = 0
+        for user_ids in self.expired_user_batches(batch_size):
+            self.delete_users(user_ids)
+            deleted += len(user_ids)
+        return deleted
+
+    def expired_user_batches(self, batch_size=None):
+        """
+        Yields lists of up to ``batch_size`` ids of users with expired
+        profiles. The table is walked in primary key order, each batch
+        starting after the last key seen, so memory stays flat and
+        callers may delete (or not) between batches.
+        """
+        if batch_size is None:
+            batch_size = getattr(
+                settings, 'REGISTRATION_CLEANUP_BATCH_SIZE', 1000)
+        last_pk = 0
+        while True:
+            rows = list(self.expired().filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', 'user_id')[:batch_size])
+            if not rows:
+                return
+            yield [user_id for _, user_id in rows]
+            last_pk = rows[-1][0]
+
+    def delete_activated_profiles(self, batch_size=None):
+        """
+        Deletes the profiles left behind by activated users, ``batch_size``
+        at a time, so the table only holds pending registrations. Returns
+        the number of profiles deleted.
+        """
+        deleted = 0
+        for profile_ids in self.activated_profile_batches(batch_size):
+            self.filter(pk__in=profile_ids).delete()
+            deleted += len(profile_ids)
+        return deleted
+
+    def activated_profile_batches(self, batch_size=None):
+        """
+        Yields lists of up to ``batch_size`` ids of activated profiles,
+        walking the table in primary key order like
+        ``expired_user_batches``.
+        """
+        if batch_size is None:
+            batch_size = getattr(
+                settings, 'REGISTRATION_CLEANUP_BATCH_SIZE', 1000)
+        last_pk = 0
+        while True:
+            profile_ids = list(self.filter(
+                activation_key=self.model.ACTIVATED, pk__gt=last_pk,
+            ).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not profile_ids:
+                return
+            yield profile_ids
+            last_pk = profile_ids[-1]
+
+    @transaction.atomic
+    def delete_users(self, user_ids):
+        """
+        Deletes the users (and, by cascade, their profiles) in one short
+        transaction.
+        """
+        get_user_model().objects.filter(pk__in=user_ids).delete()
+
+    def _get_pending_profile(self, activation_key):
+        read_db = routers.read_database()
+        aliases = [read_db]
+        if read_db != self._write_db():
+            # the key may not have reached a lagging replica yet
+            aliases.append(self._write_db())
+        for alias in aliases:
+            try:
+                return self.using(alias).unexpired().select_related(
+                    'user').get(activation_key=activation_key)
+            except self.model.DoesNotExist:
+                pass
+        return None
+
+    def _write_db(self):
+        return router.db_for_write(self.model)
 
     def _do_activate_user(self, user):
         user.is_active = True
-        user.save()
+        user.save(update_fields=['is_active'], using=self._write_db())
         return user
 
-    def _do_activate_profile(self, profile):
-        profile.activation_key = self.model.ACTIVATED
-        profile.save()
+    def _claim_profile(self, profile):
+        """
+        Marks ``profile`` activated only if its key is still the one that
+        was read, returning whether this call made the change.
+        """
+        activated_at = utc_now()
+        claimed = self.filter(
+            pk=profile.pk, activation_key=profile.activation_key).update(
+                activation_key=self.model.ACTIVATED,
+                activated_at=activated_at)
+        if claimed:
+            profile.activation_key = self.model.ACTIVATED
+            profile.activated_at = activated_at
+        return bool(claimed)
+
+    def bulk_create_inactive_users(self, users, batch_size=500,
+                                   key_generator=None):
+        """
+        Creates inactive users and their profiles from an iterable of dicts
+        holding ``username``, ``password``, ``email`` and any other user
+        fields. Each batch of ``batch_size`` users is written with one
+        INSERT for the users and one for the profiles. Passwords are
+        hashed as usual and no activation emails are sent.
+        ``key_generator`` overrides ``REGISTRATION_KEY_GENERATOR``, e.g.
+        with a ``registration.keys.KeyPool``. Returns the created users.
+        """
+        key_generator = key_generator or keys.get_key_generator()
+        created = []
+        batch = []
+        for data in users:
+            batch.append(data)
+            if len(batch) == batch_size:
+                created.extend(self._bulk_create_batch(batch, key_generator))
+                batch = []
+        if batch:
+            created.extend(self._bulk_create_batch(batch, key_generator))
+        return created
+
+    def _bulk_create_batch(self, batch, key_generator):
+        # hash before opening the transaction, it's the slow part
+        password_hashes = hashing.make_passwords(
+            [data['password'] for data in batch])
+        new_users = []
+        for data, password_hash in zip(batch, password_hashes):
+            data = dict(data)
+            del data['password']
+            user = self._build_inactive_user(
+                data.pop('username'), data.pop('email'), **data)
+            user.password = password_hash
+            new_users.append(user)
+        return self._bulk_insert(new_users, key_generator)
+
+    @transaction.atomic
+    def _bulk_insert(self, new_users, key_generator):
+        user_model = get_user_model()
+        user_model.objects.bulk_create(new_users)
+
+        # bulk_create only sets primary keys on some databases
+        lookup = "{}__in".format(user_model.USERNAME_FIELD)
+        saved_users = list(user_model.objects.filter(
+            **{lookup: [user.get_username() for user in new_users]}))
+        self.bulk_create([
+            self.model(user=user,
+                       activation_key=key_generator(user),
+                       expires_at=user.date_joined + activation_period())
+            for user in saved_users])
+        _mark_taken_on_commit([user.get_username() for user in saved_users])
+        return saved_users
+
+    def _build_inactive_user(self, username, email, **kwargs):
+        """
+        Builds an unsaved user normalized the way ``create_user`` does it.
+        Custom manager logic beyond that is skipped by the bulk path.
+        """
+        user_model = get_user_model()
+        normalize_username = getattr(user_model, 'normalize_username', None)
+        if normalize_username is not None:  # Django 1.10+
+            username = normalize_username(username)
+        kwargs[user_model.USERNAME_FIELD] = username
+        kwargs['email'] = user_model.objects.normalize_email(email)
+        kwargs['is_active'] = False
+        return user_model(**kwargs)
 
     def _get_new_inactive_user(self, username, password, email, **kwargs):
-        new_user = get_user_model().objects.create_user(
+        kwargs['is_active'] = False
+        return get_user_model().objects.create_user(
             username, email, password, **kwargs)
-        new_user.is_active = False
-        new_user.save()
-        return new_user
 
     def _create_profile(self, user):
-        salt = sha1(six.text_type(
-            random.random()).encode("utf-8")).hexdigest()[:5]
-        activation_key = sha1(
-            six.text_type(salt + user.username).encode('utf-8')).hexdigest()
-        return self.create(user=user, activation_key=activation_key)
+        return self.create(
+            user=user, activation_key=self._make_activation_key(user))
+
+    def _make_activation_key(self, user):
+        return keys.get_key_generator()(user)
 
 
 class RegistrationProfile(models.Model):
     ACTIVATED = u"ALREADY_ACTIVATED"
+    ACTIVATION_TOKEN_SALT = "registration.activation"
 
     user = models.OneToOneField(settings.AUTH_USER_MODEL)
-    activation_key = models.CharField(max_length=40)
+    # on PostgreSQL the database only indexes pending keys (0006, 0010)
+    activation_key = models.CharField(max_length=40, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    activated_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     objects = RegistrationManager()
 
     def __str__(self):
         return u"Registration information for %s" % self.user
 
+    def save(self, *args, **kwargs):
+        if self.expires_at is None and self.user_id is not None:
+            self.expires_at = self.user.date_joined + activation_period()
+        super(RegistrationProfile, self).save(*args, **kwargs)
+
     def activation_key_expired(self):
-        expiration_date = datetime.timedelta(
-            days=settings.ACCOUNT_ACTIVATION_DAYS)
-        return (self.activation_key == self.ACTIVATED) or \
-               (self.user.date_joined + expiration_date <= utc_now())
+        if self.activation_key == self.ACTIVATED:
+            return True
+        return self.expires_at <= utc_now()
+
+
+class QueuedEmailManager(models.Manager):
+
+    def create_from_message(self, message):
+        html_body = u""
+        for content, mimetype in getattr(message, 'alternatives', []):
+            if mimetype == 'text/html':
+                html_body = content
+        return self.create(
+            subject=message.subject,
+            body=message.body,
+            html_body=html_body,
+            from_email=message.from_email,
+            to=u"\n".join(message.to), )
+
+    def claim(self, batch_size=100):
+        """
+        Claims up to ``batch_size`` emails for this sender with a
+        conditional UPDATE, so concurrent senders never get the same row.
+        Emails whose claim is older than
+        ``REGISTRATION_OUTBOX_CLAIM_TIMEOUT`` seconds (600 by default),
+        left behind by a sender that died, are claimed again. Returns the
+        claimed emails, or None when there is nothing left to claim.
+        """
+        now = utc_now()
+        claimable = self.filter(
+            models.Q(claimed_at__isnull=True) |
+            models.Q(claimed_at__lte=now - datetime.timedelta(
+                seconds=getattr(
+                    settings, 'REGISTRATION_OUTBOX_CLAIM_TIMEOUT', 600))))
+        email_ids = list(claimable.order_by('pk').values_list(
+            'pk', flat=True)[:batch_size])
+        if not email_ids:
+            return None
+        token = uuid.uuid4().hex
+        claimable.filter(pk__in=email_ids).update(
+            claimed_at=now, claim_token=token)
+        return list(self.filter(claim_token=token).order_by('pk'))
+
+    def send_queued(self, batch_size=100):
+        """
+        Sends queued emails over a single mail connection, ``batch_size``
+        at a time, deleting each batch once it has been handed off. Each
+        batch is claimed first, so several senders can run at once.
+        Returns the number of emails sent.
+        """
+        sent = 0
+        connection = get_connection()
+        connection.open()
+        try:
+            while True:
+                batch = self.claim(batch_size)
+                if batch is None:
+                    return sent
+                if not batch:
+                    continue
+                connection.send_messages(
+                    [email.to_message(connection) for email in batch])
+                self.filter(pk__in=[email.pk for email in batch]).delete()
+                sent += len(batch)
+        finally:
+            connection.close()
+
+
+class QueuedEmail(models.Model):
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+
+    objects = QueuedEmailManager()
+
+    def __str__(self):
+        return u"Queued email to %s" % u", ".join(self.to.splitlines())
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            self.subject, self.body, self.from_email, self.to.splitlines(),
+            connection=connection)
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
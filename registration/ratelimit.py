@@ -0,0 +1,154 @@
+"""
+Cache backed rate limiting for the registration and activation views.
+
+Limits are configured per scope with ``REGISTRATION_RATE_LIMITS``, e.g.::
+
+    REGISTRATION_RATE_LIMITS = {
+        'register_ip': '20/h',      # registrations per client IP
+        'register_domain': '200/h',  # registrations per email domain
+        'activate_ip': '60/m',       # activation attempts per client IP
+        'resend_ip': '10/h',         # activation email resends per client IP
+    }
+
+Scopes without a rate are not limited, and nothing is limited by default.
+``REGISTRATION_RATE_LIMITER`` picks the algorithm (``SlidingWindowLimiter``
+by default, or ``TokenBucketLimiter``) and ``REGISTRATION_RATE_LIMIT_CACHE``
+the cache alias, which must be shared by all processes (any Django cache
+except locmem in multi-process deployments).
+"""
+import hashlib
+import time
+
+from django import http
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """
+    Turns ``"<count>/<s|m|h|d>"`` into a ``(count, seconds)`` tuple.
+    """
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0].lower()]
+
+
+def _hash_key(key):
+    # keys embed client supplied values (IPs, email domains) of any length
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class BaseLimiter(object):
+
+    def __init__(self, limit, period, cache):
+        self.limit = limit
+        self.period = period
+        self.cache = cache
+
+    def hit(self, key):
+        """
+        Records one request for ``key``, returns False when it goes over
+        the limit.
+        """
+        raise NotImplementedError
+
+
+class SlidingWindowLimiter(BaseLimiter):
+    """
+    Approximates a sliding window by weighting the previous fixed window's
+    counter by how much of it still overlaps the window. Counters are
+    updated with the cache's atomic ``incr``.
+    """
+
+    def hit(self, key):
+        now = time.time()
+        window = int(now // self.period)
+        key = _hash_key(key)
+        current_key = "registration:ratelimit:%s:%d" % (key, window)
+        previous_key = "registration:ratelimit:%s:%d" % (key, window - 1)
+
+        self.cache.add(current_key, 0, self.period * 2)
+        try:
+            count = self.cache.incr(current_key)
+        except ValueError:
+            # expired or evicted between add() and incr()
+            self.cache.set(current_key, 1, self.period * 2)
+            count = 1
+        previous = self.cache.get(previous_key, 0)
+        overlap = 1 - (now % self.period) / float(self.period)
+        return previous * overlap + count <= self.limit
+
+
+class TokenBucketLimiter(BaseLimiter):
+    """
+    Allows bursts of up to ``limit`` requests, refilling ``limit`` tokens
+    per ``period``. The bucket is read and written without a lock, so
+    concurrent requests may occasionally get one token too many.
+    """
+
+    def hit(self, key):
+        now = time.time()
+        cache_key = "registration:tokenbucket:%s" % _hash_key(key)
+        tokens, updated = self.cache.get(cache_key, (self.limit, now))
+        tokens = min(self.limit,
+                     tokens + (now - updated) * self.limit / self.period)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.cache.set(cache_key, (tokens, now), self.period)
+        return allowed
+
+
+def get_limiter(scope):
+    """
+    Returns a limiter for ``scope``, or None when the scope has no rate.
+    """
+    rate = getattr(settings, 'REGISTRATION_RATE_LIMITS', {}).get(scope)
+    if not rate:
+        return None
+    limiter_class = import_string(getattr(
+        settings, 'REGISTRATION_RATE_LIMITER',
+        'registration.ratelimit.SlidingWindowLimiter'))
+    cache = caches[getattr(settings, 'REGISTRATION_RATE_LIMIT_CACHE',
+                           'default')]
+    return limiter_class(*parse_rate(rate), cache=cache)
+
+
+class RateLimitMixin(object):
+    """
+    Rejects requests with a 429 response, before any other view code runs,
+    once a client goes over one of the view's rates.
+
+    ``ratelimit_methods`` lists the HTTP methods counted and
+    ``get_ratelimit_keys`` returns ``(scope, key)`` pairs to check.
+    """
+    ratelimit_methods = ('POST', )
+    ratelimit_scope_prefix = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in self.ratelimit_methods and \
+                self.is_rate_limited(request):
+            return self.rate_limited(request)
+        return super(RateLimitMixin, self).dispatch(request, *args, **kwargs)
+
+    def get_client_ip(self, request):
+        return request.META.get('REMOTE_ADDR', '')
+
+    def get_ratelimit_keys(self, request):
+        return [('%s_ip' % self.ratelimit_scope_prefix,
+                 self.get_client_ip(request))]
+
+    def is_rate_limited(self, request):
+        limited = False
+        for scope, key in self.get_ratelimit_keys(request):
+            limiter = get_limiter(scope)
+            if limiter is not None and not limiter.hit(
+                    "%s:%s" % (scope, key)):
+                limited = True
+        return limited
+
+    def rate_limited(self, request):
+        return http.HttpResponse(
+            "Too many requests, please try again later.", status=429)
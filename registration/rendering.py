@@ -0,0 +1,66 @@
+"""
+Renders the activation email templates.
+
+All templates of one email share a single context, so context processors
+run once per email instead of once per template, and compiled templates
+are kept for the life of the process (except with ``DEBUG`` on, so
+template edits show up without a restart).
+"""
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import Context
+from django.template import loader
+from django.template.base import Template as DjangoTemplate
+
+_templates = {}
+
+
+def get_template(template_name):
+    if settings.DEBUG:
+        return loader.get_template(template_name)
+    try:
+        return _templates[template_name]
+    except KeyError:
+        template = _templates[template_name] = loader.get_template(
+            template_name)
+        return template
+
+
+@receiver(setting_changed)
+def clear_template_cache(setting, **kwargs):
+    if setting in ('TEMPLATES', 'DEBUG'):
+        _templates.clear()
+
+
+def render_templates(template_names, context, request=None):
+    """
+    Renders each of ``template_names`` with ``context`` and returns the
+    results in the same order. Context processors of the Django template
+    engine are evaluated at most once for the whole set.
+    """
+    processor_data = None
+    rendered = []
+    for template_name in template_names:
+        template = get_template(template_name)
+        compiled = getattr(template, 'template', None)
+        if not isinstance(compiled, DjangoTemplate):
+            rendered.append(template.render(context, request))
+            continue
+        if processor_data is None:
+            processor_data = _run_context_processors(compiled.engine,
+                                                     request)
+        data = dict(processor_data)
+        data.update(context)
+        rendered.append(compiled.render(Context(
+            data, autoescape=getattr(compiled.engine, 'autoescape', True))))
+    return rendered
+
+
+def _run_context_processors(engine, request):
+    data = {}
+    if request is None:
+        return data
+    for processor in engine.template_context_processors:
+        data.update(processor(request))
+    return data
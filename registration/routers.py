@@ -0,0 +1,118 @@
+"""
+Read replica support.
+
+``REGISTRATION_READ_DATABASE`` names a database alias (usually a read
+replica of the default database) used for read-only registration
+queries: username availability hints, activation key lookups and, with
+``RegistrationRouter`` in ``DATABASE_ROUTERS``, every other read of the
+registration models such as the admin listing. Writes, and the username
+uniqueness check made right before the INSERT, always go to the default
+database.
+
+A replica can lag behind, so the ``Register`` view sets a cookie that
+pins the client to the default database for
+``REGISTRATION_PIN_TO_PRIMARY_SECONDS`` (5 by default). Views using
+``PinToPrimaryMixin`` send all registration reads of such a client's
+requests to the default database, so someone following their
+activation link right away doesn't hit a replica that hasn't caught up.
+"""
+import contextlib
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE_NAME = 'registration_primary'
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def use_primary():
+    """
+    Sends this thread's registration reads to the default database inside
+    the block.
+    """
+    _local.depth = getattr(_local, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+
+
+def is_pinned():
+    return getattr(_local, 'depth', 0) > 0
+
+
+def read_database():
+    """
+    Returns the alias registration reads should use right now.
+    """
+    alias = getattr(settings, 'REGISTRATION_READ_DATABASE', None)
+    if alias is None or is_pinned():
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+def pin_client(response):
+    """
+    Pins the client receiving ``response`` to the default database.
+    """
+    if getattr(settings, 'REGISTRATION_READ_DATABASE', None) is None:
+        return
+    response.set_cookie(
+        PIN_COOKIE_NAME, '1', httponly=True, max_age=getattr(
+            settings, 'REGISTRATION_PIN_TO_PRIMARY_SECONDS', 5))
+
+
+def client_pinned(request):
+    return PIN_COOKIE_NAME in request.COOKIES
+
+
+class PinToPrimaryMixin(object):
+    """
+    Reads from the default database for the whole request when the client
+    was pinned by ``pin_client``.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not client_pinned(request):
+            return super(PinToPrimaryMixin, self).dispatch(
+                request, *args, **kwargs)
+        with use_primary():
+            return super(PinToPrimaryMixin, self).dispatch(
+                request, *args, **kwargs)
+
+
+class RegistrationRouter(object):
+    """
+    Routes reads of the registration models to ``read_database()`` and
+    their writes to the default database.
+    """
+
+    def _routed(self, model):
+        return model._meta.app_label == 'registration'
+
+    def db_for_read(self, model, **hints):
+        if self._routed(model):
+            return read_database()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if self._routed(model):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = (DEFAULT_DB_ALIAS,
+                   getattr(settings, 'REGISTRATION_READ_DATABASE', None))
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'registration' and db == getattr(
+                settings, 'REGISTRATION_READ_DATABASE', None) and \
+                db != DEFAULT_DB_ALIAS:
+            return False
+        return None
@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent once per activated user, by whichever request won the activation.
+user_activated = Signal(providing_args=['user'])
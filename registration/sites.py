@@ -0,0 +1,60 @@
+"""
+Per-host ``django.contrib.sites`` lookups for ``registration.get_site``.
+
+Sites are looked up by the request's host and kept in a process wide LRU
+cache of ``REGISTRATION_SITE_CACHE_SIZE`` hosts (128 by default), so
+multi-tenant deployments get the right site name without a query per
+registration. Saving or deleting a Site clears the cache of the process
+doing it; other processes see the change once their entry is older than
+``REGISTRATION_SITE_CACHE_TIMEOUT`` seconds (60 by default).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+
+_sites = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_site_for_host(host):
+    """
+    Returns the Site whose domain is ``host`` (tried with, then without
+    the port), or None when there is none.
+    """
+    host = host.lower()
+    now = time.time()
+    with _lock:
+        if host in _sites:
+            site, expires = _sites[host] = _sites.pop(host)
+            if expires > now:
+                return site
+
+    site = _lookup(host)
+
+    with _lock:
+        _sites[host] = site, now + getattr(
+            settings, 'REGISTRATION_SITE_CACHE_TIMEOUT', 60)
+        while len(_sites) > getattr(
+                settings, 'REGISTRATION_SITE_CACHE_SIZE', 128):
+            _sites.popitem(last=False)
+    return site
+
+
+def _lookup(host):
+    domains = [host]
+    if ':' in host:
+        domains.append(host.rsplit(':', 1)[0])
+    sites = dict((site.domain.lower(), site)
+                 for site in Site.objects.filter(domain__in=domains))
+    for domain in domains:
+        if domain in sites:
+            return sites[domain]
+    return None
+
+
+def clear_site_cache(**kwargs):
+    with _lock:
+        _sites.clear()
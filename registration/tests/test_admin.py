@@ -0,0 +1,85 @@
+import datetime
+
+from django import test
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from registration.models import RegistrationProfile
+
+
+class RegistrationAdminTests(test.TestCase):
+    def setUp(self):
+        get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "secret")
+        self.client.login(username="admin", password="secret")
+        self.changelist_url = reverse(
+            "admin:registration_registrationprofile_changelist")
+
+    def create_user(self, username, **kwargs):
+        return RegistrationProfile.objects.create_inactive_user(
+            username, "secret", "%s@example.com" % username, **kwargs)
+
+    def create_expired_user(self, username):
+        return self.create_user(
+            username,
+            date_joined=timezone.now() - datetime.timedelta(days=365))
+
+    def get_changelist_query_count(self, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.changelist_url, params or {})
+        self.assertEqual(200, response.status_code)
+        return len(context)
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        self.create_user("one")
+        queries = self.get_changelist_query_count()
+
+        for i in range(10):
+            self.create_user("user%d" % i)
+
+        self.assertEqual(queries, self.get_changelist_query_count())
+
+    def test_filters_on_expired(self):
+        self.create_user("pending")
+        self.create_expired_user("expired")
+
+        for value, expected in (('yes', ["expired"]), ('no', ["pending"])):
+            response = self.client.get(
+                self.changelist_url, {'expired': value})
+
+            self.assertEqual(
+                expected,
+                [p.user.username for p in response.context['cl'].result_list])
+            where = str(response.context['cl'].queryset.query).split(
+                " WHERE ", 1)[1]
+            self.assertNotIn("CASE", where)
+
+    def test_sorts_on_expired(self):
+        self.create_expired_user("expired")
+        self.create_user("pending")
+
+        response = self.client.get(self.changelist_url, {'o': '2'})
+
+        self.assertEqual(
+            ["pending", "expired"],
+            [p.user.username for p in response.context['cl'].result_list])
+
+    def test_activate_users_activates_unexpired_profiles(self):
+        pending = self.create_user("pending")
+        expired = self.create_expired_user("expired")
+
+        self.client.post(self.changelist_url, {
+            'action': 'activate_users',
+            '_selected_action': [pending.registrationprofile.pk,
+                                 expired.registrationprofile.pk],
+        })
+
+        users = get_user_model().objects
+        self.assertTrue(users.get(pk=pending.pk).is_active)
+        self.assertFalse(users.get(pk=expired.pk).is_active)
+        self.assertEqual(
+            RegistrationProfile.ACTIVATED,
+            RegistrationProfile.objects.get(user=pending).activation_key)
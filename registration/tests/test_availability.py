@@ -0,0 +1,137 @@
+import json
+from unittest import skipUnless
+
+from django import test
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import transaction
+
+from registration import availability
+from registration.models import RegistrationProfile
+
+
+class BloomFilterTests(test.SimpleTestCase):
+    def test_contains_added_items(self):
+        bloom = availability.BloomFilter(100)
+        for i in range(100):
+            bloom.add("user%d" % i)
+
+        self.assertTrue(all("user%d" % i in bloom for i in range(100)))
+
+    def test_rarely_contains_items_not_added(self):
+        bloom = availability.BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add("user%d" % i)
+
+        false_positives = sum(
+            "other%d" % i in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+
+class UsernameAvailableTests(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        availability.reset_username_filter()
+        get_user_model().objects.create_user("alice")
+
+    def test_is_not_available_when_taken_ignoring_case(self):
+        self.assertFalse(availability.username_available("ALICE"))
+
+    def test_is_available_without_database_query_when_filter_misses(self):
+        availability.build_username_filter()
+
+        with self.assertNumQueries(0):
+            self.assertTrue(availability.username_available("bob"))
+
+    def test_queries_database_until_filter_is_built(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(availability.username_available("bob"))
+        self.assertIsNone(availability.get_username_filter())
+
+    def test_loads_newer_filter_after_check_interval(self):
+        availability.build_username_filter()
+        first = availability.get_username_filter()
+        get_user_model().objects.create_user("bob")
+        availability.build_username_filter()
+
+        self.assertIs(first, availability.get_username_filter())
+        with self.settings(
+                REGISTRATION_AVAILABILITY_FILTER_CHECK_INTERVAL=0):
+            self.assertIn("bob", availability.get_username_filter())
+
+    def test_ignores_filter_older_than_timeout(self):
+        availability.build_username_filter()
+
+        with self.settings(REGISTRATION_AVAILABILITY_FILTER_TIMEOUT=-1):
+            self.assertIsNone(availability.get_username_filter())
+
+    def test_caches_answers(self):
+        availability.username_available("alice")
+
+        with self.assertNumQueries(0):
+            self.assertFalse(availability.username_available("alice"))
+
+
+class MarkTakenOnCommitTests(test.TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        availability.reset_username_filter()
+        availability.build_username_filter()
+
+    def test_registering_marks_username_taken(self):
+        self.assertTrue(availability.username_available("bob"))
+
+        RegistrationProfile.objects.create_inactive_user(
+            "bob", "secret", "bob@example.com")
+
+        with self.assertNumQueries(0):
+            self.assertFalse(availability.username_available("bob"))
+
+    @skipUnless(hasattr(transaction, 'on_commit'), "Django 1.9+")
+    def test_rolled_back_registration_leaves_username_available(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                RegistrationProfile.objects.create_inactive_user(
+                    "zed", "secret", "zed@example.com")
+                raise RuntimeError
+
+        self.assertTrue(availability.username_available("zed"))
+
+
+class CheckAvailabilityTests(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        availability.reset_username_filter()
+
+    def test_reports_available_username_and_valid_email(self):
+        response = self.client.get(
+            reverse("registration_check_availability"),
+            {'username': 'alice', 'email': 'alice@example.com'})
+
+        self.assertEqual({
+            'username': {'available': True, 'errors': []},
+            'email': {'available': True, 'errors': []},
+        }, json.loads(response.content.decode('utf-8')))
+
+    def test_reports_taken_username(self):
+        get_user_model().objects.create_user("alice")
+
+        response = self.client.get(
+            reverse("registration_check_availability"),
+            {'username': 'alice'})
+
+        self.assertEqual({
+            'username': {
+                'available': False,
+                'errors': ["Username 'alice' is not available."]},
+        }, json.loads(response.content.decode('utf-8')))
+
+    def test_reports_invalid_username_and_email(self):
+        response = self.client.get(
+            reverse("registration_check_availability"),
+            {'username': 'alice$', 'email': 'alice'})
+
+        result = json.loads(response.content.decode('utf-8'))
+        self.assertFalse(result['username']['available'])
+        self.assertFalse(result['email']['available'])
@@ -0,0 +1,107 @@
+import datetime
+
+from six import StringIO
+
+from django import test
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from registration import availability
+from registration.models import RegistrationProfile
+
+
+class CleanupRegistrationTests(test.TestCase):
+    def setUp(self):
+        for i in range(5):
+            RegistrationProfile.objects.create_inactive_user(
+                "expired%d" % i, "secret", "expired%d@example.com" % i,
+                date_joined=timezone.now() - datetime.timedelta(days=365))
+        RegistrationProfile.objects.create_inactive_user(
+            "pending", "secret", "pending@example.com")
+
+    def call_command(self, *args, **kwargs):
+        out = StringIO()
+        call_command("cleanupregistration", *args, stdout=out, **kwargs)
+        return out.getvalue()
+
+    def test_deletes_expired_users_in_batches(self):
+        output = self.call_command("--batch-size", "2", verbosity=2)
+
+        self.assertEqual(["pending"], list(
+            get_user_model().objects.values_list("username", flat=True)))
+        self.assertIn("Deleted 4 expired user(s) so far.", output)
+        self.assertIn("Deleted 5 expired user(s).", output)
+
+    def test_dry_run_counts_without_deleting(self):
+        output = self.call_command("--dry-run", "--batch-size", "2")
+
+        self.assertEqual(6, get_user_model().objects.count())
+        self.assertIn("Found 5 expired user(s).", output)
+
+    def test_stops_once_time_budget_is_used(self):
+        output = self.call_command(
+            "--batch-size", "2", "--max-seconds", "0")
+
+        self.assertEqual(4, get_user_model().objects.count())
+        self.assertIn("Stopping after", output)
+
+
+class CompactRegistrationTests(test.TestCase):
+    def setUp(self):
+        for i in range(3):
+            user = RegistrationProfile.objects.create_inactive_user(
+                "active%d" % i, "secret", "active%d@example.com" % i)
+            RegistrationProfile.objects.activate_user(
+                user.registrationprofile.activation_key)
+        RegistrationProfile.objects.create_inactive_user(
+            "pending", "secret", "pending@example.com")
+
+    def call_command(self, *args, **kwargs):
+        out = StringIO()
+        call_command("compactregistration", *args, stdout=out, **kwargs)
+        return out.getvalue()
+
+    def test_deletes_activated_profiles_in_batches(self):
+        output = self.call_command("--batch-size", "2", verbosity=2)
+
+        self.assertEqual(["pending"], list(
+            RegistrationProfile.objects.values_list(
+                "user__username", flat=True)))
+        self.assertEqual(4, get_user_model().objects.count())
+        self.assertIn("Deleted 2 activated profile(s) so far.", output)
+        self.assertIn("Deleted 3 activated profile(s).", output)
+
+    def test_dry_run_counts_without_deleting(self):
+        output = self.call_command("--dry-run")
+
+        self.assertEqual(4, RegistrationProfile.objects.count())
+        self.assertIn("Found 3 activated profile(s).", output)
+
+
+class ResendActivationCommandTests(test.TestCase):
+    @test.modify_settings(INSTALLED_APPS={'remove': 'django.contrib.sites'})
+    def test_requires_sites_framework(self):
+        RegistrationProfile.objects.create_inactive_user(
+            "pending", "secret", "pending@example.com")
+
+        with self.assertRaisesMessage(CommandError,
+                                      "django.contrib.sites"):
+            call_command("resendactivation", stdout=StringIO())
+
+
+class BuildUsernameFilterTests(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        availability.reset_username_filter()
+        get_user_model().objects.create_user("alice")
+
+    def test_stores_filter_for_availability_checks(self):
+        out = StringIO()
+        call_command("buildusernamefilter", stdout=out)
+
+        self.assertIn("Built the username filter from 1 user(s).",
+                      out.getvalue())
+        self.assertIn("alice", availability.get_username_filter())
@@ -0,0 +1,140 @@
+import datetime
+from unittest import skipUnless
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from django import test
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.db import DatabaseError
+from django.db import transaction
+from django.utils import timezone
+
+from registration import delivery
+from registration import forms
+from registration.models import QueuedEmail
+
+
+def get_message():
+    message = EmailMultiAlternatives(
+        "subject", "body", "from@example.com", ["to@example.com"])
+    message.attach_alternative("<p>body</p>", "text/html")
+    return message
+
+
+class GetDeliveryBackendTests(test.SimpleTestCase):
+    def test_defaults_to_synchronous_delivery(self):
+        self.assertIsInstance(delivery.get_delivery_backend(),
+                              delivery.SynchronousDelivery)
+
+    @test.override_settings(
+        REGISTRATION_DELIVERY_BACKEND='registration.delivery.OutboxDelivery')
+    def test_uses_backend_from_settings(self):
+        self.assertIsInstance(delivery.get_delivery_backend(),
+                              delivery.OutboxDelivery)
+
+    def test_reuses_backend_instance(self):
+        self.assertIs(
+            delivery.get_delivery_backend(),
+            delivery.get_delivery_backend())
+
+
+class ThreadedDeliveryTests(test.TransactionTestCase):
+    def test_sends_queued_message_from_worker(self):
+        backend = delivery.ThreadedDelivery(workers=1)
+        backend.deliver(get_message())
+        backend.join()
+
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual(["to@example.com"], mail.outbox[0].to)
+
+    @skipUnless(hasattr(transaction, 'on_commit'), "Django 1.9+")
+    def test_waits_for_transaction_to_commit(self):
+        backend = delivery.ThreadedDelivery(workers=1)
+        with transaction.atomic():
+            backend.deliver(get_message())
+            self.assertEqual(0, backend.queue.qsize())
+            self.assertEqual(0, len(mail.outbox))
+        backend.join()
+
+        self.assertEqual(1, len(mail.outbox))
+
+    @skipUnless(hasattr(transaction, 'on_commit'), "Django 1.9+")
+    def test_discards_message_when_transaction_rolls_back(self):
+        backend = delivery.ThreadedDelivery(workers=1)
+        try:
+            with transaction.atomic():
+                backend.deliver(get_message())
+                raise ValueError
+        except ValueError:
+            pass
+        backend.join()
+
+        self.assertEqual(0, len(mail.outbox))
+
+
+class OutboxDeliveryTests(test.TestCase):
+    def test_stores_message_instead_of_sending(self):
+        delivery.OutboxDelivery().deliver(get_message())
+
+        self.assertEqual(0, len(mail.outbox))
+        email = QueuedEmail.objects.get()
+        self.assertEqual("subject", email.subject)
+        self.assertEqual("<p>body</p>", email.html_body)
+
+    def test_sends_and_removes_queued_messages(self):
+        for _ in range(3):
+            delivery.OutboxDelivery().deliver(get_message())
+
+        sent = QueuedEmail.objects.send_queued(batch_size=2)
+
+        self.assertEqual(3, sent)
+        self.assertEqual(0, QueuedEmail.objects.count())
+        self.assertEqual(3, len(mail.outbox))
+        self.assertEqual("body", mail.outbox[0].body)
+        self.assertEqual([("<p>body</p>", "text/html")],
+                         mail.outbox[0].alternatives)
+
+    def test_concurrent_senders_claim_different_messages(self):
+        for _ in range(3):
+            delivery.OutboxDelivery().deliver(get_message())
+
+        first = QueuedEmail.objects.claim(batch_size=2)
+        second = QueuedEmail.objects.claim(batch_size=2)
+
+        self.assertEqual(2, len(first))
+        self.assertEqual(1, len(second))
+        self.assertFalse(set(first) & set(second))
+        self.assertIsNone(QueuedEmail.objects.claim())
+
+    def test_reclaims_messages_of_dead_senders(self):
+        delivery.OutboxDelivery().deliver(get_message())
+        QueuedEmail.objects.update(
+            claimed_at=timezone.now() - datetime.timedelta(hours=1),
+            claim_token="dead")
+
+        self.assertEqual(1, QueuedEmail.objects.send_queued())
+        self.assertEqual(1, len(mail.outbox))
+
+    @test.override_settings(
+        REGISTRATION_DELIVERY_BACKEND='registration.delivery.OutboxDelivery')
+    def test_stores_activation_email_in_user_transaction(self):
+        form = forms.RegistrationForm(data={
+            'username': "alice",
+            'email': "alice@example.com",
+            'password1': "secret",
+            'password2': "secret",
+        })
+        self.assertTrue(form.is_valid())
+
+        with mock.patch.object(QueuedEmail.objects, 'create_from_message',
+                               side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                form.create_inactive_user()
+
+        self.assertFalse(get_user_model().objects.filter(
+            username="alice").exists())
@@ -0,0 +1,118 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from django import test
+from django.core.urlresolvers import reverse
+
+from registration import domains
+from registration import forms
+
+
+class DomainPolicyTests(test.SimpleTestCase):
+    def test_blocks_domains_and_their_subdomains(self):
+        policy = domains.DomainPolicy(blocked=["mailinator.com"])
+
+        self.assertTrue(policy.is_blocked("mailinator.com"))
+        self.assertTrue(policy.is_blocked("Spam.MAILINATOR.com."))
+        self.assertFalse(policy.is_blocked("notmailinator.com"))
+        self.assertFalse(policy.is_blocked("example.com"))
+
+    def test_allowed_domains_override_blocked_ones(self):
+        policy = domains.DomainPolicy(
+            blocked=["co.uk"], allowed=["example.co.uk"])
+
+        self.assertTrue(policy.is_blocked("spam.co.uk"))
+        self.assertFalse(policy.is_blocked("mail.example.co.uk"))
+
+
+class DomainFileTests(test.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(domains.reset_domain_policy)
+        domains.reset_domain_policy()
+        self.blocked_file = os.path.join(self.directory, "blocked.txt")
+        self.write(self.blocked_file, u"# disposable\n*.mailinator.com\n\n"
+                                      u"Trashmail.com  # and subdomains\n")
+
+    def write(self, path, content, mtime=None):
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_reads_domains_skipping_comments_and_blank_lines(self):
+        policy = domains.DomainPolicy.from_files(self.blocked_file)
+
+        self.assertEqual(
+            frozenset(["mailinator.com", "trashmail.com"]), policy.blocked)
+
+    def test_reloads_file_once_modified(self):
+        with self.settings(REGISTRATION_BLOCKED_DOMAINS_FILE=self.blocked_file,
+                           REGISTRATION_DOMAIN_POLICY_CHECK_INTERVAL=0):
+            self.assertTrue(domains.email_domain_blocked("a@trashmail.com"))
+            self.assertFalse(domains.email_domain_blocked("a@example.com"))
+
+            self.write(self.blocked_file, u"example.com\n",
+                       mtime=os.path.getmtime(self.blocked_file) + 10)
+
+            self.assertFalse(domains.email_domain_blocked("a@trashmail.com"))
+            self.assertTrue(domains.email_domain_blocked("a@example.com"))
+
+    def test_rejects_blocked_email_in_registration_form(self):
+        with self.settings(
+                REGISTRATION_BLOCKED_DOMAINS_FILE=self.blocked_file):
+            form = forms.RegistrationForm(data={
+                'username': "adam",
+                'email': "adam@spam.mailinator.com",
+                'password1': "secret",
+                'password2': "secret",
+            })
+
+            with self.assertNumQueries(0):
+                self.assertFalse(form.is_valid())
+
+        self.assertEqual([form.email_domain_blocked_message],
+                         form.errors['email'])
+
+    def test_reports_blocked_email_in_availability_check(self):
+        with self.settings(
+                REGISTRATION_BLOCKED_DOMAINS_FILE=self.blocked_file):
+            response = self.client.get(
+                reverse("registration_check_availability"),
+                {'email': "adam@trashmail.com"})
+
+        self.assertEqual(
+            {'email': {'available': False, 'errors': [
+                forms.RegistrationForm.email_domain_blocked_message]}},
+            response.json())
+
+    def test_keeps_last_good_policy_when_file_cant_be_read(self):
+        with self.settings(REGISTRATION_BLOCKED_DOMAINS_FILE=self.blocked_file,
+                           REGISTRATION_DOMAIN_POLICY_CHECK_INTERVAL=0):
+            self.assertTrue(domains.email_domain_blocked("a@trashmail.com"))
+
+            os.remove(self.blocked_file)
+            with mock.patch.object(domains.logger, 'exception') as log:
+                self.assertTrue(
+                    domains.email_domain_blocked("a@trashmail.com"))
+            self.assertTrue(log.called)
+
+            with io.open(self.blocked_file, 'wb') as f:
+                f.write(b"example.com\n\xff\n")
+            with mock.patch.object(domains.logger, 'exception'):
+                self.assertTrue(
+                    domains.email_domain_blocked("a@trashmail.com"))
+
+            self.write(self.blocked_file, u"example.com\n",
+                       mtime=time.time() + 10)
+            self.assertTrue(domains.email_domain_blocked("a@example.com"))
+            self.assertFalse(domains.email_domain_blocked("a@trashmail.com"))
@@ -1,11 +1,15 @@
+import datetime
+
 from django import test
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core import mail
 from django.core.urlresolvers import reverse
+from django.utils import timezone
 
 from registration import forms
 from registration import get_site
+from registration.models import RegistrationProfile
 
 
 class RegistrationFormTests(test.TestCase):
@@ -26,6 +30,18 @@ class RegistrationFormTests(test.TestCase):
         self.assertEqual(["Username 'alice' is not available."],
                          registration_form.errors['username'])
 
+    def test_requires_username_to_be_unique_ignoring_case(self):
+        get_user_model().objects.create_user("alice", "alice@example.com",
+                                             "secret")
+        registration_form = forms.RegistrationForm({
+            "username": "ALICE",
+            "email": "alice@example.com",
+            "password1": "secret",
+            "password2": "secret",
+        })
+        self.assertFalse(registration_form.is_valid())
+        self.assertIn("username", registration_form.errors)
+
     def test_rejects_certain_characters_in_username(self):
         registration_form = forms.RegistrationForm({
             "username":
@@ -201,3 +217,37 @@ class RegistrationActivateUserFormTests(test.TestCase):
             site,
         }, **self.form_data)
         self.assertEqual(expected_context, form.get_email_context(site))
+
+
+class ResendActivationEmailsTests(test.TestCase):
+    def create_user(self, username, **kwargs):
+        return RegistrationProfile.objects.create_inactive_user(
+            username, "secret", "%s@example.com" % username, **kwargs)
+
+    def test_sends_pending_and_skips_expired_or_activated_profiles(self):
+        self.create_user("alice")
+        self.create_user("bob")
+        self.create_user(
+            "carol",
+            date_joined=timezone.now() - datetime.timedelta(
+                days=settings.ACCOUNT_ACTIVATION_DAYS + 1))
+        dave = self.create_user("dave")
+        RegistrationProfile.objects.activate_user(
+            dave.registrationprofile.activation_key)
+
+        sent, skipped = forms.resend_activation_emails(
+            RegistrationProfile.objects.all(), batch_size=1)
+
+        self.assertEqual((2, 2), (sent, skipped))
+        self.assertEqual([["alice@example.com"], ["bob@example.com"]],
+                         [message.to for message in mail.outbox])
+
+    def test_uses_site_domain_for_activation_url_without_request(self):
+        user = self.create_user("alice")
+        site = get_site(None)
+
+        context = forms.ActivationEmail(user).get_email_context(site)
+
+        self.assertTrue(context['activation_url'].startswith(
+            "http://{}/".format(site.domain)))
+        self.assertEqual("alice", context['username'])
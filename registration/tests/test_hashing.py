@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from unittest import skipUnless
+
+from django import test
+from django.contrib.auth import get_user_model
+from django.contrib.auth import hashers
+
+from registration import hashing
+from registration.models import RegistrationProfile
+
+
+@test.override_settings(REGISTRATION_PASSWORD_HASHING_PROCESSES=2)
+class HashingPoolTests(test.TestCase):
+    def tearDown(self):
+        hashing.close_pool()
+
+    def test_hashes_passwords_in_pool(self):
+        self.assertIsNotNone(hashing.get_pool())
+
+        hashed = hashing.make_passwords(["secret", "other"])
+
+        self.assertTrue(hashers.check_password("secret", hashed[0]))
+        self.assertTrue(hashers.check_password("other", hashed[1]))
+
+    def test_bulk_create_inactive_users_uses_pool(self):
+        users = RegistrationProfile.objects.bulk_create_inactive_users([
+            {"username": "user%d" % i, "password": "secret%d" % i,
+             "email": "user%d@EXAMPLE.com" % i} for i in range(4)
+        ])
+
+        for user in users:
+            self.assertFalse(user.is_active)
+            self.assertEqual("%s@example.com" % user.username, user.email)
+            self.assertTrue(user.check_password(
+                "secret%s" % user.username[4:]))
+
+    def test_single_registration_doesnt_start_pool(self):
+        hashing.close_pool()
+
+        user = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+
+        self.assertTrue(user.check_password("secret"))
+        self.assertIsNone(hashing._pool)
+
+
+class NoHashingPoolTests(test.TestCase):
+    def test_pool_disabled_by_default(self):
+        self.assertIsNone(hashing.get_pool())
+        self.assertTrue(hashers.check_password(
+            "secret", hashing.make_passwords(["secret"])[0]))
+
+    @skipUnless(hasattr(get_user_model(), 'normalize_username'),
+                "Django 1.10+")
+    def test_bulk_path_normalizes_usernames_like_create_user(self):
+        username = "ａdam"  # fullwidth a, NFKC normalizes to "adam"
+        user, = RegistrationProfile.objects.bulk_create_inactive_users([
+            {"username": username, "password": "secret",
+             "email": "adam@example.com"}])
+
+        self.assertEqual(
+            get_user_model().normalize_username(username), user.username)
@@ -0,0 +1,91 @@
+import socket
+
+from django import test
+from django.core import mail
+from django.core.urlresolvers import reverse
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+
+from registration import instrumentation
+from registration.models import RegistrationProfile
+
+
+@test.override_settings(
+    REGISTRATION_INSTRUMENTATION_SINK=(
+        'registration.instrumentation.MemorySink'))
+class InstrumentationTests(test.TestCase):
+    def setUp(self):
+        self.sink = instrumentation.get_sink()
+        self.sink.clear()
+
+    def test_records_each_registration_stage(self):
+        self.client.post(reverse("registration_register"), {
+            'username': 'alice',
+            'email': 'alice@example.com',
+            'password1': 'secret',
+            'password2': 'secret',
+        })
+
+        self.assertEqual(
+            ['user_insert', 'profile_insert', 'render_email',
+             'deliver_email'],
+            self.sink.stages())
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_records_queries_and_duration_of_activation(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "alice", "secret", "alice@example.com")
+        self.sink.clear()
+
+        RegistrationProfile.objects.activate_user(
+            user.registrationprofile.activation_key)
+
+        (stage, duration, queries), = self.sink.records
+        self.assertEqual('activate_user', stage)
+        self.assertGreaterEqual(duration, 0)
+        self.assertEqual(5, queries)
+
+    def test_counts_queries_without_the_debug_query_log(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        # a long running worker that has filled the bounded query log
+        connection.queries_log.extend(
+            {'sql': '', 'time': '0'} for _ in range(connection.queries_limit))
+        self.addCleanup(connection.queries_log.clear)
+
+        with instrumentation.timed('lookup'):
+            RegistrationProfile.objects.filter(activation_key="x").exists()
+
+        self.assertEqual([('lookup', 1)],
+                         [(stage, q) for stage, _, q in self.sink.records])
+        self.assertFalse(connection.queries_logged)
+
+    def test_sends_stage_timed_signal(self):
+        received = []
+
+        def receiver(stage, **kwargs):
+            received.append(stage)
+
+        instrumentation.stage_timed.connect(receiver)
+        try:
+            RegistrationProfile.objects.activate_user("missing")
+        finally:
+            instrumentation.stage_timed.disconnect(receiver)
+
+        self.assertEqual(['activate_user'], received)
+
+
+class StatsdSinkTests(test.SimpleTestCase):
+    def test_sends_duration_and_queries_over_udp(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        self.addCleanup(server.close)
+
+        with self.settings(REGISTRATION_STATSD_PORT=server.getsockname()[1]):
+            sink = instrumentation.StatsdSink()
+        sink.record('activate_user', 0.0125, 3)
+
+        self.assertEqual(
+            b"registration.activate_user.duration:12.500|ms\n"
+            b"registration.activate_user.queries:3|c",
+            server.recv(1024))
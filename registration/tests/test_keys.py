@@ -0,0 +1,73 @@
+import os
+import re
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import six
+
+from django import test
+from django.core.urlresolvers import reverse
+
+from registration import keys
+from registration.models import RegistrationProfile
+
+KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{40}$')
+
+
+class KeyGeneratorTests(test.SimpleTestCase):
+    def test_default_generator_makes_url_safe_fixed_length_keys(self):
+        generated = set(keys.default_key_generator() for _ in range(1000))
+
+        self.assertEqual(1000, len(generated))
+        for key in generated:
+            six.assertRegex(self, key, KEY_PATTERN)
+            reverse("registration_activate", kwargs={'activation_key': key})
+
+    def test_key_pool_refills_with_unique_keys(self):
+        pool = keys.KeyPool(size=10)
+
+        generated = [pool() for _ in range(25)]
+
+        self.assertEqual(25, len(set(generated)))
+        for key in generated:
+            six.assertRegex(self, key, KEY_PATTERN)
+
+    def test_key_pool_refills_after_fork(self):
+        pool = keys.KeyPool(size=10)
+        pool()
+        parent_keys = list(pool._keys)
+
+        with mock.patch.object(keys.os, 'getpid',
+                               return_value=os.getpid() + 1):
+            key = pool()
+
+        self.assertNotIn(key, parent_keys)
+        self.assertEqual(9, len(pool._keys))
+
+    @test.override_settings(
+        REGISTRATION_KEY_GENERATOR='registration.keys.sha1_key_generator')
+    def test_uses_generator_from_settings(self):
+        self.assertIs(keys.sha1_key_generator, keys.get_key_generator())
+
+
+class ProfileKeyTests(test.TestCase):
+    def test_creates_profile_with_generated_key(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+
+        six.assertRegex(
+            self, user.registrationprofile.activation_key, KEY_PATTERN)
+
+    def test_bulk_creates_profiles_with_given_key_generator(self):
+        users = RegistrationProfile.objects.bulk_create_inactive_users([
+            {"username": "user%d" % i, "password": "secret",
+             "email": "user%d@example.com" % i} for i in range(3)
+        ], key_generator=keys.sha1_key_generator)
+
+        for user in users:
+            six.assertRegex(
+                self, user.registrationprofile.activation_key,
+                r'^[0-9a-f]{40}$')
@@ -1,11 +1,20 @@
 import datetime
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 from django import test
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
+from registration import signals
 from registration.models import RegistrationProfile
+from registration.models import RegistrationQuerySet
 
 
 class RegistrationManagerTests(test.TestCase):
@@ -31,6 +40,35 @@ class RegistrationManagerTests(test.TestCase):
         self.assertEqual(True, user.check_password("secret"))
         self.assertIsNotNone(user.registrationprofile.activation_key)
 
+    def test_creates_user_and_profile_with_one_insert_each(self):
+        with CaptureQueriesContext(connection) as context:
+            RegistrationProfile.objects.create_inactive_user(
+                "adam", "secret", "adam@example.com")
+
+        statements = [query['sql'].split()[0] for query in context]
+        self.assertEqual(2, statements.count("INSERT"))
+        self.assertNotIn("UPDATE", statements)
+
+    def test_bulk_creates_inactive_users_and_profiles(self):
+        users = RegistrationProfile.objects.bulk_create_inactive_users([
+            {"username": "adam", "password": "secret",
+             "email": "adam@example.com", "first_name": "Adam"},
+            {"username": "eve", "password": "secret",
+             "email": "eve@example.com"},
+            {"username": "cain", "password": "secret",
+             "email": "cain@example.com"},
+        ], batch_size=2)
+
+        self.assertEqual({"adam", "eve", "cain"},
+                         {user.username for user in users})
+        for user in get_user_model().objects.filter(
+                username__in=["adam", "eve", "cain"]):
+            self.assertFalse(user.is_active)
+            self.assertTrue(user.check_password("secret"))
+            self.assertEqual(40, len(user.registrationprofile.activation_key))
+        self.assertEqual("Adam", get_user_model().objects.get(
+            username="adam").first_name)
+
     def test_allows_other_user_attributes_at_initial_creation(self):
         user = RegistrationProfile.objects.create_inactive_user(
             "adam",
@@ -48,14 +86,29 @@ class RegistrationManagerTests(test.TestCase):
         self.assertEqual(user, False)
 
     def test_returns_false_if_activation_key_is_expired(self):
+        with self.settings(ACCOUNT_ACTIVATION_DAYS=0):
+            user = RegistrationProfile.objects.create_inactive_user(
+                "adam", "secret", "adam@example.com")
+
+        activation_key = user.registrationprofile.activation_key
+        activated_user = RegistrationProfile.objects.activate_user(
+            activation_key)
+        self.assertEqual(activated_user, False)
+
+    def test_sets_expiration_and_activation_times(self):
         user = RegistrationProfile.objects.create_inactive_user(
             "adam", "secret", "adam@example.com")
+        profile = user.registrationprofile
+        self.assertEqual(
+            user.date_joined + datetime.timedelta(
+                days=settings.ACCOUNT_ACTIVATION_DAYS),
+            profile.expires_at)
+        self.assertIsNone(profile.activated_at)
 
-        with self.settings(ACCOUNT_ACTIVATION_DAYS=0):
-            activation_key = user.registrationprofile.activation_key
-            activated_user = RegistrationProfile.objects.activate_user(
-                activation_key)
-        self.assertEqual(activated_user, False)
+        RegistrationProfile.objects.activate_user(profile.activation_key)
+
+        self.assertIsNotNone(
+            RegistrationProfile.objects.get(pk=profile.pk).activated_at)
 
     def test_activates_user(self):
         user = RegistrationProfile.objects.create_inactive_user(
@@ -70,6 +123,127 @@ class RegistrationManagerTests(test.TestCase):
         self.assertEqual(RegistrationProfile.ACTIVATED,
                          updated_user.registrationprofile.activation_key)
 
+    def test_loads_profile_and_user_in_one_query_when_activating(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+        activation_key = user.registrationprofile.activation_key
+
+        # one SELECT for profile and user, one UPDATE for each, plus the
+        # savepoint around the UPDATEs
+        with self.assertNumQueries(5):
+            RegistrationProfile.objects.activate_user(activation_key)
+
+    def test_only_updates_changed_columns_when_activating(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+
+        with CaptureQueriesContext(connection) as context:
+            RegistrationProfile.objects.activate_user(
+                user.registrationprofile.activation_key)
+
+        updates = [q['sql'] for q in context if q['sql'].startswith("UPDATE")]
+        self.assertEqual(2, len(updates))
+        self.assertNotIn('"password"', updates[0])
+        self.assertNotIn('"user_id"', updates[1])
+
+    def test_sends_user_activated_once(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+        activation_key = user.registrationprofile.activation_key
+        received = []
+
+        def receiver(user, **kwargs):
+            received.append(user)
+
+        signals.user_activated.connect(receiver)
+        self.addCleanup(signals.user_activated.disconnect, receiver)
+        RegistrationProfile.objects.activate_user(activation_key)
+        RegistrationProfile.objects.activate_user(activation_key)
+
+        self.assertEqual([user], received)
+
+    def test_concurrent_activation_writes_once(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+        activation_key = user.registrationprofile.activation_key
+        # what a second request read before the first one finished
+        stale_profile = RegistrationProfile.objects.select_related(
+            "user").get(user=user)
+        RegistrationProfile.objects.activate_user(activation_key)
+
+        with mock.patch.object(RegistrationQuerySet, "get",
+                               return_value=stale_profile):
+            with CaptureQueriesContext(connection) as context:
+                activated = RegistrationProfile.objects.activate_user(
+                    activation_key)
+
+        self.assertFalse(activated)
+        self.assertEqual(1, len([
+            q for q in context if q['sql'].startswith("UPDATE")]))
+
+    def test_activates_many_users_by_key(self):
+        adam = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+        eve = RegistrationProfile.objects.create_inactive_user(
+            "eve", "secret", "eve@example.com")
+        cain = RegistrationProfile.objects.create_inactive_user(
+            "cain", "secret", "cain@example.com",
+            date_joined=timezone.now() - datetime.timedelta(days=365))
+        keys = [user.registrationprofile.activation_key
+                for user in (adam, eve, cain)]
+
+        activated = RegistrationProfile.objects.activate_users(
+            keys + ["missing"], batch_size=2)
+
+        self.assertEqual(set(keys[:2]), set(activated))
+        active = dict(get_user_model().objects.filter(
+            pk__in=[adam.pk, eve.pk, cain.pk]).values_list(
+                "username", "is_active"))
+        self.assertEqual(
+            {"adam": True, "eve": True, "cain": False}, active)
+        self.assertEqual(2, RegistrationProfile.objects.filter(
+            activation_key=RegistrationProfile.ACTIVATED,
+            activated_at__isnull=False).count())
+
+    @test.override_settings(REGISTRATION_DELETE_ACTIVATED_PROFILES=True)
+    def test_deletes_profile_on_activation_when_configured(self):
+        adam = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+        eve = RegistrationProfile.objects.create_inactive_user(
+            "eve", "secret", "eve@example.com")
+        adam_key = adam.registrationprofile.activation_key
+
+        self.assertEqual(
+            adam, RegistrationProfile.objects.activate_user(adam_key))
+        RegistrationProfile.objects.activate_users(
+            [eve.registrationprofile.activation_key])
+
+        self.assertFalse(RegistrationProfile.objects.filter(
+            user__in=[adam, eve]).exists())
+        self.assertEqual(2, get_user_model().objects.filter(
+            pk__in=[adam.pk, eve.pk], is_active=True).count())
+        self.assertFalse(RegistrationProfile.objects.activate_user(adam_key))
+
+    def test_deletes_activated_profiles_in_batches(self):
+        for name in ("adam", "eve", "cain"):
+            user = RegistrationProfile.objects.create_inactive_user(
+                name, "secret", "%s@example.com" % name)
+            RegistrationProfile.objects.activate_user(
+                user.registrationprofile.activation_key)
+        RegistrationProfile.objects.create_inactive_user(
+            "abel", "secret", "abel@example.com")
+
+        deleted = RegistrationProfile.objects.delete_activated_profiles(
+            batch_size=2)
+
+        self.assertEqual(3, deleted)
+        self.assertFalse(RegistrationProfile.objects.filter(
+            user__username__in=["adam", "eve", "cain"]).exists())
+        self.assertTrue(RegistrationProfile.objects.filter(
+            user__username="abel").exists())
+        self.assertEqual(4, get_user_model().objects.filter(
+            username__in=["adam", "eve", "cain", "abel"]).count())
+
     @test.override_settings(ACCOUNT_ACTIVATION_DAYS=1)
     def test_deletes_expired_profiles_profiles(self):
         # Active user, not activated profile (not expired)
@@ -121,6 +295,55 @@ class RegistrationManagerTests(test.TestCase):
         self.assertQuerysetEqual(remaining_profiles,
                                  [repr(p) for p in [p1, p3, p4, p5, p6]])
 
+    @test.override_settings(ACCOUNT_ACTIVATION_DAYS=1)
+    def test_deletes_expired_users_in_batches(self):
+        for username in ("one", "two", "three"):
+            user = get_user_model().objects.create(
+                username=username,
+                date_joined=timezone.now() - datetime.timedelta(days=2),
+                is_active=False)
+            RegistrationProfile.objects.create(
+                user=user, activation_key="some-key")
+
+        deleted = RegistrationProfile.objects.delete_expired_users(
+            batch_size=2)
+
+        self.assertEqual(3, deleted)
+        self.assertEqual(0, RegistrationProfile.objects.count())
+        self.assertFalse(get_user_model().objects.filter(
+            username__in=("one", "two", "three")).exists())
+
+    def test_activation_token_is_key_when_signing_is_off(self):
+        manager = RegistrationProfile.objects
+        self.assertEqual("key", manager.get_activation_token("key"))
+        self.assertEqual("key", manager.resolve_activation_token("key"))
+
+    @test.override_settings(REGISTRATION_SIGNED_ACTIVATION_KEYS=True)
+    def test_resolves_signed_activation_token(self):
+        manager = RegistrationProfile.objects
+        token = manager.get_activation_token("key")
+
+        self.assertNotEqual("key", token)
+        with self.assertNumQueries(0):
+            self.assertEqual("key", manager.resolve_activation_token(token))
+
+    @test.override_settings(REGISTRATION_SIGNED_ACTIVATION_KEYS=True)
+    def test_rejects_forged_or_malformed_activation_tokens(self):
+        manager = RegistrationProfile.objects
+        token = manager.get_activation_token("key")
+
+        self.assertIsNone(manager.resolve_activation_token(
+            "other" + token[3:]))
+        self.assertIsNone(manager.resolve_activation_token("key"))
+
+    @test.override_settings(REGISTRATION_SIGNED_ACTIVATION_KEYS=True)
+    def test_rejects_signed_activation_token_once_expired(self):
+        manager = RegistrationProfile.objects
+        token = manager.get_activation_token("key")
+
+        with self.settings(ACCOUNT_ACTIVATION_DAYS=-1):
+            self.assertIsNone(manager.resolve_activation_token(token))
+
 
 class RegistrationProfileModelTests(test.TestCase):
     def setUp(self):
@@ -131,10 +354,9 @@ class RegistrationProfileModelTests(test.TestCase):
         self.expired_user = RegistrationProfile.objects.create_inactive_user(
             "bob",
             "secret",
-            "bob@example.com", )
-        self.expired_user.date_joined -= datetime.timedelta(
-            days=settings.ACCOUNT_ACTIVATION_DAYS + 1)
-        self.expired_user.save()
+            "bob@example.com",
+            date_joined=timezone.now() - datetime.timedelta(
+                days=settings.ACCOUNT_ACTIVATION_DAYS + 1), )
 
     def test_uses_user_in_string_representation(self):
         user = get_user_model().objects.create_user("aaron", "secret",
@@ -151,7 +373,49 @@ class RegistrationProfileModelTests(test.TestCase):
             user=self.expired_user)
         self.assertTrue(profile.activation_key_expired())
 
+    def test_filters_expiry_without_joining_user(self):
+        for queryset in (RegistrationProfile.objects.unexpired(),
+                         RegistrationProfile.objects.annotate_expired()):
+            self.assertNotIn(
+                get_user_model()._meta.db_table, str(queryset.query))
+
+    def test_checks_expiration_without_loading_user(self):
+        profile = RegistrationProfile.objects.get(user=self.expired_user)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(profile.activation_key_expired())
+
     def test_is_expired_if_already_activated(self):
         profile = RegistrationProfile.objects.get(user=self.sample_user)
         profile.activation_key = RegistrationProfile.ACTIVATED
         self.assertTrue(profile.activation_key_expired())
+
+
+class ActivationKeyIndexTests(test.TestCase):
+    def get_key_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, RegistrationProfile._meta.db_table)
+        return dict(
+            (name, info) for name, info in constraints.items()
+            if info['index'] and info['columns'] == ['activation_key'])
+
+    def test_indexes_pending_keys_only_on_postgresql(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest("checks the PostgreSQL schema")
+        self.assertEqual(['registration_pending_key_idx'],
+                         list(self.get_key_indexes()))
+
+    def test_keeps_full_index_elsewhere(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest("checks other schemas")
+        indexes = self.get_key_indexes()
+        self.assertEqual(1, len(indexes))
+        self.assertNotIn('registration_pending_key_idx', indexes)
+
+    def test_table_rebuild_keeps_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite rebuilds tables from model state")
+        with connection.schema_editor() as editor:
+            editor._remake_table(RegistrationProfile)
+        self.assertEqual(1, len(self.get_key_indexes()))
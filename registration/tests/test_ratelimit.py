@@ -0,0 +1,91 @@
+import warnings
+
+from django import test
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+
+from registration import ratelimit
+
+
+class ParseRateTests(test.SimpleTestCase):
+    def test_parses_count_and_period(self):
+        self.assertEqual((10, 60), ratelimit.parse_rate("10/m"))
+        self.assertEqual((5, 3600), ratelimit.parse_rate("5/hour"))
+
+
+class LimiterTests(test.SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_sliding_window_allows_up_to_limit(self):
+        limiter = ratelimit.SlidingWindowLimiter(3, 3600, cache)
+
+        self.assertEqual([True, True, True, False],
+                         [limiter.hit("key") for _ in range(4)])
+        self.assertTrue(limiter.hit("other"))
+
+    def test_token_bucket_allows_burst_up_to_limit(self):
+        limiter = ratelimit.TokenBucketLimiter(3, 3600, cache)
+
+        self.assertEqual([True, True, True, False],
+                         [limiter.hit("key") for _ in range(4)])
+        self.assertTrue(limiter.hit("other"))
+
+    def test_hashes_client_supplied_keys(self):
+        key = "register_domain:%s.com" % ("x" * 300)
+        for limiter_class in (ratelimit.SlidingWindowLimiter,
+                              ratelimit.TokenBucketLimiter):
+            limiter = limiter_class(3, 3600, cache)
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                limiter.hit(key)
+            self.assertEqual([], [str(w.message) for w in caught])
+
+
+class RateLimitedViewTests(test.TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def register(self, username, email):
+        return self.client.post(reverse("registration_register"), {
+            'username': username,
+            'email': email,
+            'password1': 'secret',
+            'password2': 'secret',
+        })
+
+    @test.override_settings(REGISTRATION_RATE_LIMITS={'register_ip': '2/h'})
+    def test_rejects_registrations_over_ip_rate_without_queries(self):
+        self.register("one", "one@example.com")
+        self.register("two", "two@example.com")
+
+        with self.assertNumQueries(0):
+            response = self.register("three", "three@example.com")
+
+        self.assertEqual(429, response.status_code)
+
+    @test.override_settings(
+        REGISTRATION_RATE_LIMITS={'register_domain': '1/h'})
+    def test_rejects_registrations_over_email_domain_rate(self):
+        self.register("one", "one@example.com")
+
+        self.assertEqual(
+            429, self.register("two", "two@EXAMPLE.com").status_code)
+        self.assertEqual(
+            302, self.register("three", "three@example.org").status_code)
+
+    @test.override_settings(REGISTRATION_RATE_LIMITS={'register_ip': '1/h'})
+    def test_does_not_limit_displaying_register_page(self):
+        for _ in range(3):
+            response = self.client.get(reverse("registration_register"))
+            self.assertEqual(200, response.status_code)
+
+    @test.override_settings(
+        REGISTRATION_RATE_LIMITS={'activate_ip': '1/m'},
+        REGISTRATION_RATE_LIMITER='registration.ratelimit.TokenBucketLimiter')
+    def test_rejects_activations_over_ip_rate(self):
+        url = reverse("registration_activate",
+                      kwargs={'activation_key': '123'})
+
+        self.assertEqual(200, self.client.get(url).status_code)
+        self.assertEqual(429, self.client.get(url).status_code)
@@ -0,0 +1,64 @@
+import copy
+
+from django import test
+from django.conf import settings
+
+from registration import rendering
+
+calls = []
+
+
+def counting_processor(request):
+    calls.append(request)
+    return {'processed': 'yes', 'site': 'from processor'}
+
+
+def get_templates_setting():
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['OPTIONS']['context_processors'] = [
+        'registration.tests.test_rendering.counting_processor']
+    return templates
+
+
+class RenderTemplatesTests(test.SimpleTestCase):
+    def setUp(self):
+        del calls[:]
+
+    def test_runs_context_processors_once_for_all_templates(self):
+        request = test.RequestFactory().get("/")
+        with self.settings(TEMPLATES=get_templates_setting()):
+            rendering.render_templates([
+                "registration/email/activation_email_subject.txt",
+                "registration/email/activation_email.txt",
+                "registration/email/activation_email.html",
+            ], {'site': 'example.com'}, request)
+
+        self.assertEqual([request], calls)
+
+    def test_given_context_overrides_context_processors(self):
+        request = test.RequestFactory().get("/")
+        with self.settings(TEMPLATES=get_templates_setting()):
+            subject, = rendering.render_templates(
+                ["registration/email/activation_email_subject.txt"],
+                {'site': 'example.com'}, request)
+
+        self.assertEqual("example.com activation.", subject.strip())
+
+    def test_skips_context_processors_without_request(self):
+        with self.settings(TEMPLATES=get_templates_setting()):
+            rendering.render_templates(
+                ["registration/email/activation_email_subject.txt"],
+                {'site': 'example.com'})
+
+        self.assertEqual([], calls)
+
+    def test_reuses_compiled_template(self):
+        template_name = "registration/email/activation_email.txt"
+        self.assertIs(rendering.get_template(template_name),
+                      rendering.get_template(template_name))
+
+    def test_clears_template_cache_when_templates_change(self):
+        template_name = "registration/email/activation_email.txt"
+        template = rendering.get_template(template_name)
+        with self.settings(TEMPLATES=get_templates_setting()):
+            self.assertIsNot(template, rendering.get_template(template_name))
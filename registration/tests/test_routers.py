@@ -0,0 +1,107 @@
+from django import test
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.db import IntegrityError
+
+from registration import forms
+from registration import routers
+from registration.models import RegistrationProfile
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class ReadDatabaseTests(test.SimpleTestCase):
+    def test_reads_default_database_without_replica(self):
+        self.assertEqual('default', routers.read_database())
+
+    @test.override_settings(REGISTRATION_READ_DATABASE='replica')
+    def test_reads_replica_unless_pinned(self):
+        self.assertEqual('replica', routers.read_database())
+
+        with routers.use_primary():
+            self.assertEqual('default', routers.read_database())
+
+        self.assertEqual('replica', routers.read_database())
+
+    @test.override_settings(REGISTRATION_READ_DATABASE='replica')
+    def test_router_sends_reads_to_replica_and_writes_to_default(self):
+        router = routers.RegistrationRouter()
+
+        self.assertEqual('replica', router.db_for_read(RegistrationProfile))
+        self.assertEqual('default', router.db_for_write(RegistrationProfile))
+        self.assertIsNone(router.db_for_read(get_user_model()))
+        self.assertFalse(router.allow_migrate('replica', 'registration'))
+        self.assertIsNone(router.allow_migrate('default', 'registration'))
+
+
+@test.override_settings(
+    REGISTRATION_READ_DATABASE='replica',
+    DATABASE_ROUTERS=['registration.routers.RegistrationRouter'])
+class ReplicaReadTests(test.TestCase):
+    multi_db = True
+
+    def register(self, username="adam"):
+        return self.client.post(reverse("registration_register"), {
+            'username': username,
+            'email': "%s@example.com" % username,
+            'password1': "secret",
+            'password2': "secret",
+        })
+
+    def test_register_pins_client_to_primary(self):
+        self.register()
+        key = RegistrationProfile.objects.using('default').get(
+            user__username="adam").activation_key
+
+        with self.assertNumQueries(0, using='replica'):
+            response = self.client.get(reverse(
+                "registration_activate", kwargs={'activation_key': key}))
+
+        self.assertRedirects(
+            response, reverse("registration_activation_complete"))
+
+    def test_checks_username_uniqueness_on_primary(self):
+        get_user_model().objects.create_user(
+            "adam", "adam@example.com", "secret")
+        form = forms.RegistrationForm(data={
+            'username': "adam",
+            'email': "adam@example.com",
+            'password1': "secret",
+            'password2': "secret",
+        })
+
+        with self.assertNumQueries(0, using='replica'):
+            self.assertFalse(form.is_valid())
+
+    def test_reports_username_taken_by_concurrent_registration(self):
+        with mock.patch.object(
+                forms.RegistrationForm, 'create_inactive_user',
+                side_effect=IntegrityError):
+            response = self.register()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [forms.RegistrationForm.username_unavailable_message % {
+                'username': "adam"}],
+            response.context['form'].errors['username'])
+
+    def test_unknown_keys_are_looked_up_on_primary_too(self):
+        with self.assertNumQueries(1, using='replica'), \
+                self.assertNumQueries(1, using='default'):
+            self.assertFalse(
+                RegistrationProfile.objects.activate_user("missing"))
+
+    def test_activates_key_on_primary_when_replica_lags(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "adam", "secret", "adam@example.com")
+
+        with self.assertNumQueries(1, using='replica'):
+            activated = RegistrationProfile.objects.activate_user(
+                user.registrationprofile.activation_key)
+
+        self.assertEqual(user, activated)
+        self.assertTrue(get_user_model().objects.using('default').get(
+            pk=user.pk).is_active)
@@ -0,0 +1,65 @@
+from django import test
+from django.contrib.sites.models import Site
+from django.contrib.sites.requests import RequestSite
+
+from registration import get_site
+from registration import sites
+
+
+@test.override_settings(ALLOWED_HOSTS=['*'])
+class GetSiteTests(test.TestCase):
+    def setUp(self):
+        sites.clear_site_cache()
+        self.site = Site.objects.create(domain="tenant.example.com",
+                                        name="Tenant")
+
+    def get_request(self, host):
+        return test.RequestFactory().get("/", HTTP_HOST=host)
+
+    def test_uses_site_matching_request_host(self):
+        self.assertEqual(self.site,
+                         get_site(self.get_request("tenant.example.com")))
+
+    def test_ignores_port_when_matching_host(self):
+        self.assertEqual(
+            self.site, get_site(self.get_request("tenant.example.com:8000")))
+
+    def test_falls_back_to_request_site_for_unknown_host(self):
+        site = get_site(self.get_request("other.example.com"))
+
+        self.assertIsInstance(site, RequestSite)
+        self.assertEqual("other.example.com", site.domain)
+
+    def test_caches_sites_per_host(self):
+        get_site(self.get_request("tenant.example.com"))
+        get_site(self.get_request("other.example.com"))
+
+        with self.assertNumQueries(0):
+            get_site(self.get_request("tenant.example.com"))
+            get_site(self.get_request("other.example.com"))
+
+    def test_clears_cache_when_site_changes(self):
+        get_site(self.get_request("tenant.example.com"))
+        self.site.name = "Renamed"
+        self.site.save()
+
+        self.assertEqual(
+            "Renamed", get_site(self.get_request("tenant.example.com")).name)
+
+    @test.override_settings(REGISTRATION_SITE_CACHE_SIZE=1)
+    def test_evicts_least_recently_used_host(self):
+        get_site(self.get_request("tenant.example.com"))
+        get_site(self.get_request("other.example.com"))
+
+        with self.assertNumQueries(1):
+            get_site(self.get_request("tenant.example.com"))
+
+    @test.override_settings(REGISTRATION_SITE_CACHE_TIMEOUT=0)
+    def test_looks_up_site_again_once_entry_expires(self):
+        get_site(self.get_request("other.example.com"))
+        # a Site added by another process, which can't clear our cache
+        Site.objects.bulk_create([
+            Site(domain="other.example.com", name="Other")])
+
+        self.assertEqual(
+            "Other", get_site(self.get_request("other.example.com")).name)
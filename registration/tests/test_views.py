@@ -1,5 +1,7 @@
 from django import test
 from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 
 from registration import forms
@@ -90,3 +92,74 @@ class ActivateTests(test.TestCase):
         self.assertEqual(True, updated_user.is_active)
         self.assertEqual(RegistrationProfile.ACTIVATED,
                          updated_user.registrationprofile.activation_key)
+
+    @test.override_settings(REGISTRATION_SIGNED_ACTIVATION_KEYS=True)
+    def test_activates_user_with_signed_activation_key(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "user", "pswd", "user@me.com")
+        token = RegistrationProfile.objects.get_activation_token(
+            user.registrationprofile.activation_key)
+
+        response = self.client.get(
+            reverse("registration_activate", kwargs={'activation_key': token}))
+
+        self.assertRedirects(response,
+                             reverse("registration_activation_complete"))
+        self.assertTrue(get_user_model().objects.get(pk=user.pk).is_active)
+
+    @test.override_settings(REGISTRATION_SIGNED_ACTIVATION_KEYS=True)
+    def test_rejects_unsigned_activation_key_without_database_lookup(self):
+        user = RegistrationProfile.objects.create_inactive_user(
+            "user", "pswd", "user@me.com")
+        activation_key = user.registrationprofile.activation_key
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse(
+                "registration_activate",
+                kwargs={'activation_key': activation_key}))
+
+        self.assertTemplateUsed(response,
+                                "registration/activation_failed.html")
+        self.assertFalse(get_user_model().objects.get(pk=user.pk).is_active)
+
+
+class ResendActivationTests(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = RegistrationProfile.objects.create_inactive_user(
+            "alice", "secret", "alice@example.com")
+
+    def resend(self, email):
+        return self.client.post(
+            reverse("registration_resend_activation"), {'email': email})
+
+    def test_resends_activation_email_for_pending_registration(self):
+        response = self.resend("Alice@Example.com")
+
+        self.assertRedirects(
+            response, reverse("registration_resend_activation_complete"))
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual(["alice@example.com"], mail.outbox[0].to)
+        self.assertIn(
+            self.user.registrationprofile.activation_key, mail.outbox[0].body)
+
+    def test_repeated_requests_cool_down_without_queries_or_mail(self):
+        self.resend("alice@example.com")
+
+        with self.assertNumQueries(0):
+            response = self.resend("alice@example.com")
+
+        self.assertRedirects(
+            response, reverse("registration_resend_activation_complete"))
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_doesnt_reveal_unknown_or_activated_addresses(self):
+        RegistrationProfile.objects.activate_user(
+            self.user.registrationprofile.activation_key)
+
+        for email in ("alice@example.com", "nobody@example.com"):
+            response = self.resend(email)
+            self.assertRedirects(
+                response, reverse("registration_resend_activation_complete"))
+        self.assertEqual(0, len(mail.outbox))
@@ -7,6 +7,10 @@ registration_urls = [
     url(
         r'^register/$', views.Register.as_view(),
         name='registration_register'),
+    url(
+        r'^register/check/$',
+        views.CheckAvailability.as_view(),
+        name='registration_check_availability'),
     url(
         r'^register/complete/$',
         views.RegistrationComplete.as_view(),
@@ -16,7 +20,15 @@ registration_urls = [
         views.ActivationComplete.as_view(),
         name='registration_activation_complete'),
     url(
-        r'^activate/(?P<activation_key>\w+)/$',
+        r'^activate/resend/$',
+        views.ResendActivation.as_view(),
+        name='registration_resend_activation'),
+    url(
+        r'^activate/resend/complete/$',
+        views.ResendActivationComplete.as_view(),
+        name='registration_resend_activation_complete'),
+    url(
+        r'^activate/(?P<activation_key>[\w:-]+)/$',
         views.Activate.as_view(),
         name='registration_activate'),
 ]
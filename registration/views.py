@@ -1,15 +1,31 @@
 from django import http
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from django.views.generic import TemplateView
+from django.views.generic import View
 from django.views.generic.edit import FormView
 from django.core.urlresolvers import reverse
 
+from registration import availability
+from registration import domains
 from registration import forms
 from registration import models
+from registration import routers
+from registration.ratelimit import RateLimitMixin
 
 
-class Register(FormView):
+class Register(RateLimitMixin, FormView):
     template_name = 'registration/register.html'
     form_class = forms.RegistrationForm
+    ratelimit_scope_prefix = 'register'
+
+    def get_ratelimit_keys(self, request):
+        keys = super(Register, self).get_ratelimit_keys(request)
+        email = request.POST.get('email', '')
+        if '@' in email:
+            keys.append(('register_domain',
+                         email.rsplit('@', 1)[1].strip().lower()))
+        return keys
 
     def get_success_url(self):
         if self.success_url:
@@ -17,8 +33,66 @@ class Register(FormView):
         return reverse("registration_complete")
 
     def form_valid(self, form):
-        form.create_inactive_user(self.request)
-        return super(Register, self).form_valid(form)
+        try:
+            form.create_inactive_user(self.request)
+        except IntegrityError:
+            # someone took the username since clean_username checked it
+            form.add_error('username', form.username_unavailable_message %
+                           form.cleaned_data)
+            return self.form_invalid(form)
+        response = super(Register, self).form_valid(form)
+        routers.pin_client(response)
+        return response
+
+
+class CheckAvailability(routers.PinToPrimaryMixin, View):
+    """
+    Tells the registration page, while the user is still typing, whether
+    a username is free and whether an email address is valid. Answers
+    come from ``registration.availability`` so most never hit the
+    database.
+    """
+    form_class = forms.RegistrationForm
+    field_names = ('username', 'email')
+
+    def get(self, request, *args, **kwargs):
+        form = self.form_class()
+        return http.JsonResponse(dict(
+            (name, self.check_field(form, name, request.GET[name]))
+            for name in self.field_names if name in request.GET))
+
+    def check_field(self, form, name, value):
+        try:
+            value = form.fields[name].clean(value)
+            if name == 'username' and not availability.username_available(
+                    value):
+                raise ValidationError(
+                    form.username_unavailable_message % {'username': value})
+            if name == 'email' and domains.email_domain_blocked(value):
+                raise ValidationError(form.email_domain_blocked_message)
+        except ValidationError as e:
+            return {'available': False, 'errors': e.messages}
+        return {'available': True, 'errors': []}
+
+
+class ResendActivation(RateLimitMixin, routers.PinToPrimaryMixin,
+                       FormView):
+    template_name = 'registration/resend_activation.html'
+    form_class = forms.ResendActivationForm
+    ratelimit_scope_prefix = 'resend'
+
+    def get_success_url(self):
+        if self.success_url:
+            return self.success_url
+        return reverse("registration_resend_activation_complete")
+
+    def form_valid(self, form):
+        form.resend(self.request)
+        return super(ResendActivation, self).form_valid(form)
+
+
+class ResendActivationComplete(TemplateView):
+    template_name = 'registration/resend_activation_complete.html'
 
 
 class RegistrationComplete(TemplateView):
@@ -29,13 +103,17 @@ class ActivationComplete(TemplateView):
     template_name = 'registration/activation_complete.html'
 
 
-class Activate(TemplateView):
+class Activate(RateLimitMixin, routers.PinToPrimaryMixin, TemplateView):
     template_name = 'registration/activation_failed.html'
+    ratelimit_methods = ('GET', )
+    ratelimit_scope_prefix = 'activate'
 
     def get(self, request, *args, **kwargs):
-        new_user = models.RegistrationProfile.objects.activate_user(
+        manager = models.RegistrationProfile.objects
+        activation_key = manager.resolve_activation_token(
             kwargs['activation_key'])
-        if new_user:
+        if activation_key is not None and manager.activate_user(
+                activation_key):
             return http.HttpResponseRedirect(
                 reverse("registration_activation_complete"))
         return super(Activate, self).get(request, *args, **kwargs)
@@ -1,4 +1,6 @@
 #!/usr/bin/env python
+import argparse
+import json
 import os
 import sys
 
@@ -16,5 +18,43 @@ def runtests():
     sys.exit(bool(failures))
 
 
+def runbenchmarks(users, cleanup_sizes, output):
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'example.settings'
+    django.setup()
+    from benchmarks import pipeline
+
+    test_runner = get_runner(settings)(verbosity=0)
+    test_runner.setup_test_environment()
+    old_config = test_runner.setup_databases()
+    try:
+        results = pipeline.run(users=users, cleanup_sizes=cleanup_sizes)
+    finally:
+        test_runner.teardown_databases(old_config)
+        test_runner.teardown_test_environment()
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+
 if __name__ == "__main__":
-    runtests()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--benchmark', action='store_true',
+        help="Run the throughput benchmarks instead of the tests.")
+    parser.add_argument(
+        '--users', type=int, default=200,
+        help="Users registered and activated by the benchmarks.")
+    parser.add_argument(
+        '--cleanup-sizes', type=int, nargs='+', default=[1000, 5000, 20000],
+        help="Expired registration counts timed for cleanup.")
+    parser.add_argument(
+        '--output', help="Write benchmark results to this JSON file.")
+    args = parser.parse_args()
+    if args.benchmark:
+        runbenchmarks(args.users, args.cleanup_sizes, args.output)
+    else:
+        runtests()
@@ -16,7 +16,7 @@ setup(
     description="Django registration app",
     url="https://github.com/madisona/django-registration",
     test_suite='runtests.runtests',
-    packages=find_packages(exclude=["example"]),
+    packages=find_packages(exclude=["example", "benchmarks"]),
     include_package_data=True,
     tests_require=TEST_REQUIREMENTS,
     classifiers=[